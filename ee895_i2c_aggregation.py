@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental aggregation of EE895 samples into minute, hour and day windows.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+
+Samples go into the windows of the first tier; a closed window is merged
+into the window of the next tier, so every tier costs the same however
+long its windows are. A window is closed once the newest timestamp is
+lateness seconds past its end, later samples for it are dropped.
+
+With a directory, every tier appends its closed windows to
+"<width>s.agg": the magic "EE895AGG", version, record size, window width
+(float64) and then the AGGREGATE records. flush() writes them out and
+saves the open windows to "state.json"; a new Aggregator on the same
+directory resumes from there.
+"""
+
+import json
+import math
+import os
+import struct
+import time
+
+import numpy as np
+
+AGGREGATE_MAGIC = b"EE895AGG"
+AGGREGATE_VERSION = 1
+AGGREGATE_HEADER = struct.Struct("<8sHHd")
+# names of the aggregated quantities, as in Sample, and their statistics
+AGGREGATED = ("temperature", "co2", "pressure")
+STATISTICS = ("min", "mean", "max", "last")
+# 63 bytes per window, statistics of a quantity without samples are nan
+AGGREGATE = np.dtype([("start", "<f8"), ("count", "<u4"), ("status", "<u2"),
+                      ("flags", "u1")]
+                     + [(name + "_" + statistic, "<f4")
+                        for name in AGGREGATED for statistic in STATISTICS])
+FLAG_STATUS = 0x01  # status_details of a sample had bits set, see status
+FLAG_INCOMPLETE = 0x02  # fewer than MIN_COVERAGE of the expected samples
+FLAG_LATE = 0x04  # samples came out of order
+MIN_COVERAGE = 0.9
+# window width in seconds and closed windows kept in memory: a day of
+# minutes, a month of hours and a year of days
+DEFAULT_TIERS = ((60, 1440), (3600, 744), (86400, 366))
+STATE_FILE = "state.json"
+STATE_VERSION = 1
+
+
+def read_aggregates(path):
+    """(window width, records) of an aggregate file, the records are a
+    numpy.memmap of AGGREGATE"""
+    with open(path, "rb") as aggregate_file:
+        width = unpack_aggregate_header(aggregate_file)
+        size = aggregate_file.seek(0, os.SEEK_END)
+    count = (size - AGGREGATE_HEADER.size) // AGGREGATE.itemsize
+    if not count:
+        return width, np.zeros(0, AGGREGATE)
+    return width, np.memmap(path, AGGREGATE, "r", AGGREGATE_HEADER.size, (count,))
+
+
+def unpack_aggregate_header(aggregate_file):
+    """window width of an open aggregate file"""
+    header = aggregate_file.read(AGGREGATE_HEADER.size)
+    if len(header) < AGGREGATE_HEADER.size or not header.startswith(AGGREGATE_MAGIC):
+        raise ValueError("not an EE895 aggregate file")
+    _, version, record_size, width = AGGREGATE_HEADER.unpack(header)
+    if version != AGGREGATE_VERSION or record_size != AGGREGATE.itemsize:
+        raise ValueError("unsupported EE895 aggregate file")
+    return width
+
+
+class _Window():
+    """Running statistics of an open window."""
+
+    __slots__ = ("start", "count", "status", "flags", "last_time", "minimum",
+                 "maximum", "total", "counts", "last")
+
+    def __init__(self, start):
+        self.start = start
+        self.count = 0
+        self.status = 0
+        self.flags = 0
+        self.last_time = -math.inf
+        self.minimum = [math.inf] * len(AGGREGATED)
+        self.maximum = [-math.inf] * len(AGGREGATED)
+        self.total = [0.0] * len(AGGREGATED)
+        self.counts = [0] * len(AGGREGATED)
+        self.last = [math.nan] * len(AGGREGATED)
+
+    def add(self, timestamp, values, status):
+        """add a sample, nan values are left out"""
+        self.count += 1
+        if status:
+            self.status |= status
+            self.flags |= FLAG_STATUS
+        latest = timestamp >= self.last_time
+        if latest:
+            self.last_time = timestamp
+        else:
+            self.flags |= FLAG_LATE
+        for index, value in enumerate(values):
+            if value != value:  # nan
+                continue
+            if value < self.minimum[index]:
+                self.minimum[index] = value
+            if value > self.maximum[index]:
+                self.maximum[index] = value
+            self.total[index] += value
+            self.counts[index] += 1
+            if latest:
+                self.last[index] = value
+
+    def merge(self, window):
+        """add the samples of a closed window of a lower tier"""
+        self.count += window.count
+        self.status |= window.status
+        self.flags |= window.flags & ~FLAG_INCOMPLETE
+        latest = window.last_time >= self.last_time
+        if latest:
+            self.last_time = window.last_time
+        for index, count in enumerate(window.counts):
+            if not count:
+                continue
+            self.minimum[index] = min(self.minimum[index], window.minimum[index])
+            self.maximum[index] = max(self.maximum[index], window.maximum[index])
+            self.total[index] += window.total[index]
+            self.counts[index] += count
+            if latest and window.last[index] == window.last[index]:
+                self.last[index] = window.last[index]
+
+    def row(self, width, interval):
+        """the window as a record of AGGREGATE"""
+        flags = self.flags
+        if interval and self.count * interval < width * MIN_COVERAGE:
+            flags |= FLAG_INCOMPLETE
+        row = [self.start, self.count, self.status, flags]
+        for index, count in enumerate(self.counts):
+            if count:
+                row += [self.minimum[index], self.total[index] / count,
+                        self.maximum[index], self.last[index]]
+            else:
+                row += [math.nan] * len(STATISTICS)
+        return tuple(row)
+
+    def state(self):
+        """the window as json"""
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_state(cls, state):
+        """window saved by state()"""
+        window = cls(state[0])
+        for name, value in zip(cls.__slots__, state):
+            setattr(window, name, value)
+        return window
+
+
+class Tier():
+    """Windows of width seconds: the open ones and a ring buffer of the
+    last capacity closed ones."""
+
+    def __init__(self, width, capacity):
+        self.width = width
+        self.capacity = capacity
+        self.data = np.zeros(capacity, AGGREGATE)
+        self.windows = {}
+        self.logged = 0
+        self._next = 0
+        self._count = 0
+        self._file = None
+
+    @property
+    def nbytes(self):
+        """memory taken by the closed windows"""
+        return self.data.nbytes
+
+    def __len__(self):
+        return self._count
+
+    def history(self, start=None, end=None):
+        """closed windows with start <= window start < end in chronological
+        order, as a copy"""
+        if self._count < self.capacity:
+            rows = self.data[:self._count].copy()
+        else:
+            rows = np.concatenate((self.data[self._next:], self.data[:self._next]))
+        low = 0 if start is None else np.searchsorted(rows["start"], start, "left")
+        high = len(rows) if end is None else np.searchsorted(rows["start"], end, "left")
+        return rows[low:high]
+
+    def latest(self):
+        """the newest closed window, None before the first one"""
+        if not self._count:
+            return None
+        return self.data[self._next - 1]
+
+    def store(self, row):
+        """keep a closed window and append it to the file"""
+        index = self._next
+        self.data[index] = row
+        self._next = 0 if index + 1 == self.capacity else index + 1
+        if self._count < self.capacity:
+            self._count += 1
+        if self._file is not None:
+            self._file.write(self.data[index:index + 1].tobytes())
+            self.logged += 1
+
+    def open(self, path, logged=None):
+        """append closed windows to path; the file is cut back to logged
+        windows, all complete ones without, and its last ones are loaded"""
+        if not os.path.exists(path):
+            temporary_path = path + ".tmp"
+            with open(temporary_path, "wb") as aggregate_file:
+                aggregate_file.write(AGGREGATE_HEADER.pack(
+                    AGGREGATE_MAGIC, AGGREGATE_VERSION, AGGREGATE.itemsize, self.width))
+                aggregate_file.flush()
+                os.fsync(aggregate_file.fileno())
+            os.replace(temporary_path, path)
+        self._file = open(path, "r+b")  # pylint: disable=consider-using-with
+        if unpack_aggregate_header(self._file) != self.width:
+            self._file.close()
+            raise ValueError("%s holds windows of another width" % path)
+        count = (self._file.seek(0, os.SEEK_END) - AGGREGATE_HEADER.size) // AGGREGATE.itemsize
+        if logged is not None:
+            count = min(count, logged)
+        self._file.truncate(AGGREGATE_HEADER.size + count * AGGREGATE.itemsize)
+        self._file.seek(0, os.SEEK_END)
+        self.logged = count
+        loaded = min(count, self.capacity)
+        if loaded:
+            self._file.seek(AGGREGATE_HEADER.size + (count - loaded) * AGGREGATE.itemsize)
+            self.data[:loaded] = np.frombuffer(
+                self._file.read(loaded * AGGREGATE.itemsize), AGGREGATE)
+            self._file.seek(0, os.SEEK_END)
+        self._count = loaded
+        self._next = loaded % self.capacity
+
+    def flush(self):
+        """write the appended windows to disk"""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """close the file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Aggregator():
+    """Min, mean, max and last of temperature, co2 and pressure over the
+    windows of every tier, updated sample by sample in constant memory.
+
+    Windows start at multiples of their width in the time of the
+    timestamps, the widths of the tiers have to be multiples of each other.
+    With interval, the seconds between two samples, windows holding fewer
+    than MIN_COVERAGE of the expected samples get FLAG_INCOMPLETE; windows
+    without any sample are not stored at all. Windows with a sample whose
+    status_details had bits set get FLAG_STATUS and the bits in status.
+    Closed windows are flushed to the directory every flush_interval
+    seconds, on close() and when flush() is called.
+    """
+
+    def __init__(self, tiers=DEFAULT_TIERS, lateness=30.0, interval=None, directory=None,
+                 flush_interval=60.0, clock=time.monotonic):
+        self.tiers = [Tier(width, capacity) for width, capacity in tiers]
+        for lower, upper in zip(self.tiers, self.tiers[1:]):
+            if upper.width % lower.width:
+                raise ValueError("window width %r is no multiple of %r"
+                                 % (upper.width, lower.width))
+        self.lateness = lateness
+        self.interval = interval
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.watermark = -math.inf
+        self.samples = 0
+        self.dropped = 0
+        self._closing = math.inf
+        self._last_flush = clock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._resume()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def nbytes(self):
+        """memory taken by the closed windows of all tiers"""
+        return sum(tier.nbytes for tier in self.tiers)
+
+    def tier(self, width):
+        """the Tier of windows of width seconds"""
+        for tier in self.tiers:
+            if tier.width == width:
+                return tier
+        raise KeyError(width)
+
+    def add(self, timestamp, temperature, co2, pressure, status=0):
+        """add a sample, returns False if it came too late and was dropped"""
+        tier = self.tiers[0]
+        start = timestamp - timestamp % tier.width
+        window = tier.windows.get(start)
+        if window is None:
+            end = start + tier.width + self.lateness
+            if end <= self.watermark:
+                self.dropped += 1
+                return False
+            window = tier.windows[start] = _Window(start)
+            self._closing = min(self._closing, end)
+        window.add(timestamp, (temperature, co2, pressure), status)
+        self.samples += 1
+        if timestamp > self.watermark:
+            self.watermark = timestamp
+            if timestamp >= self._closing:
+                self._close()
+        return True
+
+    def add_readings(self, readings, timestamp=None):
+        """add a dict of quantity => Reading or number of EE895.read_many,
+        status_details is used when it is in readings"""
+        values = []
+        for name in ("temperature_c", "co2_average_pc", "pressure_mbar", "status_details"):
+            value = readings.get(name)
+            values.append(getattr(value, "value", value))
+        return self.add(time.time() if timestamp is None else timestamp,
+                        *(math.nan if value is None else value for value in values[:3]),
+                        status=values[3] or 0)
+
+    def add_sample(self, sample, status=0, timestamp=None):
+        """add a Sample of EE895.stream, its timestamp is monotonic so the
+        current time is used unless timestamp is given"""
+        return self.add(time.time() if timestamp is None else timestamp,
+                        sample.temperature, sample.co2, sample.pressure, status)
+
+    def _close(self):
+        """close the windows the watermark passed, lowest tier first so
+        their windows are merged before the upper tier closes"""
+        closing = math.inf
+        for index, tier in enumerate(self.tiers):
+            upper = self.tiers[index + 1] if index + 1 < len(self.tiers) else None
+            for start in sorted(tier.windows):
+                end = start + tier.width + self.lateness
+                if end > self.watermark:
+                    closing = min(closing, end)
+                    break
+                window = tier.windows.pop(start)
+                tier.store(window.row(tier.width, self.interval))
+                if upper is not None:
+                    upper_start = start - start % upper.width
+                    if upper_start not in upper.windows:
+                        upper.windows[upper_start] = _Window(upper_start)
+                    upper.windows[upper_start].merge(window)
+        self._closing = closing
+        if self.directory is not None and self.clock() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """write the closed windows to disk and then save the open ones,
+        a restart resumes from the last flush"""
+        if self.directory is None:
+            return
+        for tier in self.tiers:
+            tier.flush()
+        state = {"version": STATE_VERSION,
+                 "widths": [tier.width for tier in self.tiers],
+                 "logged": [tier.logged for tier in self.tiers],
+                 "windows": [[window.state() for window in tier.windows.values()]
+                             for tier in self.tiers],
+                 "watermark": self.watermark, "samples": self.samples,
+                 "dropped": self.dropped}
+        path = os.path.join(self.directory, STATE_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as state_file:
+            json.dump(state, state_file)
+            state_file.flush()
+            os.fsync(state_file.fileno())
+        os.replace(path + ".tmp", path)
+        self._last_flush = self.clock()
+
+    def _resume(self):
+        """open the files of the tiers and continue from the saved state;
+        windows appended after the last flush are cut off, their samples
+        are in the saved open windows"""
+        path = os.path.join(self.directory, STATE_FILE)
+        state = None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as state_file:
+                state = json.load(state_file)
+            if (state["version"] != STATE_VERSION
+                    or state["widths"] != [tier.width for tier in self.tiers]):
+                raise ValueError("%s holds other tiers" % self.directory)
+        for index, tier in enumerate(self.tiers):
+            tier.open(os.path.join(self.directory, "%ds.agg" % tier.width),
+                      None if state is None else state["logged"][index])
+        if state is None:
+            return
+        for tier, windows in zip(self.tiers, state["windows"]):
+            for window in windows:
+                window = _Window.from_state(window)
+                tier.windows[window.start] = window
+                self._closing = min(self._closing,
+                                    window.start + tier.width + self.lateness)
+        self.watermark = state["watermark"]
+        self.samples = state["samples"]
+        self.dropped = state["dropped"]
+
+    def close(self):
+        """flush and close the files, the open windows stay open"""
+        self.flush()
+        for tier in self.tiers:
+            tier.close()
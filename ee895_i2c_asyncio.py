@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio interface for the EE895 Sensor via I2c interface.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+"""
+
+import asyncio
+import functools
+
+from ee895_i2c_library import CONVERSION_TIME_WEIGHT, SAMPLE_QUANTITIES
+
+# share of the expected waiting time slept before polling data_ready
+EXPECTED_WAIT_SHARE = 0.9
+
+
+class AsyncEE895():
+    """Runs the transactions of an EE895 in an executor, off the event loop.
+
+    Measurements are read as soon as the sensor reports data ready. The
+    waiting time is learned, so data_ready is polled only shortly before
+    new data is expected, then every poll_interval, doubling up to
+    max_poll_interval.
+    """
+
+    def __init__(self, sensor, executor=None, poll_interval=0.05,
+                 max_poll_interval=1.0):
+        self.sensor = sensor
+        self.executor = executor
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.measuring_interval = None
+        self.conversion_time = None
+        self._last_ready = None
+        # created in the running loop, a lock made before asyncio.run()
+        # belongs to another loop on Python 3.8 and 3.9
+        self._lock = None
+        self._lock_loop = None
+
+    async def run(self, function, *args):
+        """run a blocking call of the sensor in the executor"""
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        async with self._lock:
+            return await loop.run_in_executor(
+                self.executor, functools.partial(function, *args))
+
+    async def data_ready(self):
+        """shows if the data is ready to be read"""
+        return await self.run(self.sensor.data_ready)
+
+    async def wait_data_ready(self, expected_wait=0.0, timeout=None):
+        """wait until the sensor reports new data, returns the waited time"""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        if expected_wait > 0:
+            await asyncio.sleep(expected_wait * EXPECTED_WAIT_SHARE)
+        delay = self.poll_interval
+        while not await self.data_ready():
+            if timeout is not None and loop.time() - start + delay > timeout:
+                raise asyncio.TimeoutError("EE895 data not ready")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_poll_interval)
+        return loop.time() - start
+
+    async def read(self, quantities=SAMPLE_QUANTITIES, timeout=None):
+        """wait for the next measurement of the continuous mode and read
+        quantities of REGISTER_MAP, returns a dict of Reading"""
+        loop = asyncio.get_running_loop()
+        if self.measuring_interval is None:
+            self.measuring_interval = await self.run(
+                self.sensor.read_co2_measuring_interval) / 10
+        expected_wait = 0.0
+        if self._last_ready is not None:
+            expected_wait = self._last_ready + self.measuring_interval - loop.time()
+        await self.wait_data_ready(expected_wait, timeout)
+        self._last_ready = loop.time()
+        return await self.run(self.sensor.read_many, quantities)
+
+    async def trigger_and_read(self, quantities=SAMPLE_QUANTITIES, timeout=None):
+        """trigger a measurement in single shot mode, wait for it and read
+        quantities of REGISTER_MAP, returns a dict of Reading"""
+        await self.run(self.sensor.trigger_new_measurement)
+        waited = await self.wait_data_ready(self.conversion_time or 0.0, timeout)
+        if self.conversion_time is None:
+            self.conversion_time = waited
+        else:
+            self.conversion_time += CONVERSION_TIME_WEIGHT * (waited - self.conversion_time)
+        return await self.run(self.sensor.read_many, quantities)
+
+    async def stream(self, quantities=SAMPLE_QUANTITIES):
+        """yield every new measurement of the continuous mode"""
+        while True:
+            yield await self.read(quantities)
@@ -0,0 +1,1178 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the EE895 library, run against a fake i2c bus or the simulator.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with regard
+to configuration and equipment as well as all eventualities. The application example
+is intended to provide assistance with the EE895 sensor module design-in and is provided "as is".
+You yourself are responsible for the proper operation of the products described.
+This application example does not release you from the obligation to handle the product safely
+during application, installation, operation and maintenance. By using this application example,
+you acknowledge that we cannot be held liable for any damage beyond the liability regulations
+described.
+
+We reserve the right to make changes to this application example at any time without notice.
+In case of discrepancies between the suggestions in this application example and other E+E
+publications, such as catalogues, the content of the other documentation takes precedence.
+We assume no liability for the information contained in this document.
+
+Usage: python3 ee895_i2c_benchmark.py [benchmark ...]
+"""
+
+import asyncio
+import ctypes
+import errno
+import math
+import multiprocessing
+import os
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+import ee895_i2c_library
+from ee895_i2c_library import (EE895, EE895Error, I2CBus, RetryPolicy, IEEE754, IEEE754_array, calc_crc16,
+                               crc16, crc16_start, read_frame, MEASUREMENT_QUANTITIES,
+                               FUNCTION_CODE_READ_REGISTER,
+                               FUNCTION_CODE_WRITE_REGISTER,
+                               REGISTER_TEMPERATURE_CELSIUS)
+from ee895_i2c_aggregation import Aggregator, FLAG_STATUS, read_aggregates
+from ee895_i2c_asyncio import AsyncEE895
+from ee895_i2c_binlog import BinaryLogReader, BinaryLogWriter
+from ee895_i2c_cache import RegisterCache
+from ee895_i2c_fast_path import FastPathSampler
+from ee895_i2c_collector import Collector, CollectorClient
+from ee895_i2c_events import Event, EventEngine, Threshold
+from ee895_i2c_fleet import SensorFleet
+from ee895_i2c_instrumentation import TransactionStats
+from ee895_i2c_replay import RecordingTransport, ReplayTransport
+from ee895_i2c_scheduler import SamplingScheduler, VirtualClock
+from ee895_i2c_shared_memory import (SHARED_SAMPLE, SharedMemoryPublisher,
+                                     SharedMemoryReader)
+from ee895_i2c_simulator import EE895Simulator
+from ee895_i2c_single_shot_engine import SingleShotEngine
+from ee895_i2c_timeseries import TimeSeries
+
+TRANSACTIONS = 20000
+BUS_LATENCY = 0.001  # about one 8 byte Modbus exchange at 100 kHz
+# seconds over a bare interpreter start, checked by bench_startup
+IMPORT_BUDGET = 0.08
+COLD_START_BUDGET = 0.2
+
+
+def fake_response(command, receiving_bytes):
+    """answer a command like the sensor does, with zeroed measurement data"""
+    if command[0] == FUNCTION_CODE_READ_REGISTER:
+        response = [command[0], receiving_bytes - 4] + [0] * (receiving_bytes - 4)
+        crc = crc16(response, crc16_start())
+        return response + [crc & 0xFF, crc >> 8]
+    if command[0] == FUNCTION_CODE_WRITE_REGISTER:
+        return command
+    return [0] * receiving_bytes
+
+
+class FakeSMBus():
+    """Stands in for smbus2.SMBus, opening /dev/null instead of /dev/i2c-x."""
+
+    def __init__(self, bus=None):
+        self.bus = bus
+        self.fd = os.open(os.devnull, os.O_RDWR)
+        # SMBus queries the adapter functionality with an ioctl on open
+        os.fstat(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """close the file handle"""
+        os.close(self.fd)
+
+    def i2c_rdwr(self, write_command, read_command):
+        """fill the read message with the answer to the write message"""
+        response = fake_response(list(write_command), read_command.len)
+        ctypes.memmove(read_command.buf, bytes(response), read_command.len)
+
+
+class FakeI2CBus(I2CBus):
+    """I2CBus on a FakeSMBus, the SMBus of the library stays untouched."""
+
+    def open(self):
+        """open a FakeSMBus, if it is not already open"""
+        with self._lock:
+            if self._smbus is None:
+                self._smbus = FakeSMBus(self.bus_number)
+            return self._smbus
+
+
+class ReopeningI2CBus(FakeI2CBus):
+    """Opens and closes the bus for every transaction, like the library used to."""
+
+    def write_read(self, i2c_address, buf, receiving_bytes):
+        try:
+            return super().write_read(i2c_address, buf, receiving_bytes)
+        finally:
+            self.close()
+
+
+def legacy_calc_crc16(buf, end):
+    """the bit by bit crc16 the library used before the lookup table"""
+    buf.insert(0, 0x5F)
+    crc = 0xFFFF
+    for j in range(end):
+        crc ^= buf[j]
+        for _ in range(8, 0, -1):
+            if (crc & 0x0001) != 0:
+                crc = crc >> 1
+                crc ^= 0xA001
+            else:
+                crc = crc >> 1
+    buf.pop(0)
+    return crc
+
+
+def legacy_read_checksums(response):
+    """build the request frame and check the response like the old library"""
+    command = [FUNCTION_CODE_READ_REGISTER, (REGISTER_TEMPERATURE_CELSIUS >> 8),
+               (REGISTER_TEMPERATURE_CELSIUS & 0xFF), 0x00, 0x02]
+    crc = legacy_calc_crc16(command, 6)
+    command.append(crc & 0xFF)
+    command.append(crc >> 8)
+    return legacy_calc_crc16(response, 7)
+
+
+def read_checksums(response, start=crc16_start()):
+    """fetch the cached request frame and check the response"""
+    read_frame(0x5F, REGISTER_TEMPERATURE_CELSIUS, 0x02)
+    return crc16(response[:6], start)
+
+
+def check_crc16_equivalence(samples=20000):
+    """the lookup table crc16 has to match the bit by bit crc16 exactly"""
+    rng = random.Random(895)
+    start = crc16_start()
+    for _ in range(samples):
+        buf = [rng.randrange(256) for _ in range(rng.randrange(1, 40))]
+        data = bytes(buf)
+        expected = legacy_calc_crc16(list(buf), len(buf) + 1)
+        if not (expected == calc_crc16(buf, len(buf) + 1) == crc16(data, start)
+                == crc16(memoryview(data), start)):
+            raise AssertionError("crc16 mismatch for %r" % buf)
+
+
+def legacy_convert_to_number(number):
+    """the mantissa loop the library used before struct, ignores bit 0"""
+    count = -1
+    mantissa = 0
+    for i in range(22, 0, -1):
+        mantissa += (((number >> i) & 0x01) * pow(2, count))
+        count -= 1
+    return mantissa + 1
+
+
+def legacy_IEEE754(buf):
+    """the float decoding the library used before struct"""
+    sign = buf[2] >> 7
+    if sign:
+        sign = -1
+    else:
+        sign = 1
+    biased_exponent = (((buf[2] & 0x7F) << 1) + (buf[3] >> 7))
+    exponent = biased_exponent - 127
+    mantissa = (buf[3] & 0x7F) * 65536 + buf[0] * 256 + buf[1]
+    mantissa = legacy_convert_to_number(mantissa)
+    return sign * mantissa * pow(2, exponent)
+
+
+def random_payloads(count, seed=895):
+    """random 4 byte register payloads, in the word order of the sensor"""
+    rng = random.Random(seed)
+    return [[rng.randrange(256) for _ in range(4)] for _ in range(count)]
+
+
+def check_IEEE754_equivalence(samples=100000):
+    """struct decoding has to match the old loop wherever the old loop was
+    exact, and the numpy decoding has to match struct for every bit pattern"""
+    payloads = random_payloads(samples)
+    # inf, -inf, nan, smallest denormal, -0
+    payloads += [[0, 0, 0x7F, 0x80], [0, 0, 0xFF, 0x80], [0, 0, 0x7F, 0xC0],
+                 [0, 1, 0x00, 0x00], [0, 0, 0x80, 0x00]]
+    batch = IEEE754_array(bytes(byte for payload in payloads for byte in payload))
+    for payload, batch_value in zip(payloads, batch):
+        value = IEEE754(payload)
+        if struct.pack(">f", value) != struct.pack(">f", batch_value):
+            raise AssertionError("numpy decoding differs for %r" % payload)
+        biased_exponent = ((payload[2] & 0x7F) << 1) + (payload[3] >> 7)
+        if 0 < biased_exponent < 255 and payload[1] & 0x01 == 0:
+            if value != legacy_IEEE754(payload):
+                raise AssertionError("struct decoding differs for %r" % payload)
+    if not (IEEE754([0, 0, 0xFF, 0x80]) == -math.inf
+            and math.isnan(IEEE754([0, 0, 0x7F, 0xC0]))
+            and IEEE754([0, 1, 0x00, 0x00]) == 2.0 ** -149):
+        raise AssertionError("special values are not decoded")
+
+
+def measure(function, count=TRANSACTIONS):
+    """call function count times and return the calls per second"""
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return count / (time.perf_counter() - start)
+
+
+def bench_bus_session():
+    """bus transactions per second, reopening the bus vs one open session"""
+    command = [FUNCTION_CODE_READ_REGISTER, 0x03, 0xEA, 0x00, 0x02, 0x00, 0x00]
+    with ReopeningI2CBus() as bus:
+        before = measure(lambda: bus.write_read(0x5F, command, 8))
+    with FakeI2CBus() as bus:
+        after = measure(lambda: bus.write_read(0x5F, command, 8))
+    return [("reopen per transaction", before, "tx/s"),
+            ("one bus session", after, "tx/s")]
+
+
+def bench_crc16():
+    """checksum work of one register read, bit by bit vs lookup table"""
+    check_crc16_equivalence()
+    response = fake_response([FUNCTION_CODE_READ_REGISTER], 8)
+    before = measure(lambda: legacy_read_checksums(response))
+    after = measure(lambda: read_checksums(response))
+    return [("bit by bit crc16, frame built per read", before, "reads/s"),
+            ("lookup table crc16, cached frame", after, "reads/s")]
+
+
+def bench_IEEE754():
+    """float decoding, pow loop vs struct vs numpy batch"""
+    check_IEEE754_equivalence()
+    payloads = random_payloads(TRANSACTIONS)
+    raw = bytes(byte for payload in payloads for byte in payload)
+    start = time.perf_counter()
+    for payload in payloads:
+        legacy_IEEE754(payload)
+    before = len(payloads) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for payload in payloads:
+        IEEE754(payload)
+    after = len(payloads) / (time.perf_counter() - start)
+    batch = measure(lambda: IEEE754_array(raw), 100) * len(payloads)
+    return [("pow loop", before, "values/s"),
+            ("struct", after, "values/s"),
+            ("numpy batch", batch, "values/s")]
+
+
+SNAPSHOT = ["co2_average_pc", "co2_raw_pc", "co2_average_npc", "co2_raw_npc",
+            "temperature_c", "temperature_f", "temperature_k",
+            "pressure_mbar", "pressure_psi"]
+
+
+def read_snapshot_one_by_one(sensor):
+    """read every quantity of SNAPSHOT with its own getter"""
+    return [sensor.get_co2_aver_with_pc(), sensor.get_co2_raw_with_pc(),
+            sensor.get_co2_aver_with_npc(), sensor.get_co2_raw_with_npc(),
+            sensor.get_temp_c(), sensor.get_temp_f(), sensor.get_temp_k(),
+            sensor.get_pressure_mbar(), sensor.get_pressure_psi()]
+
+
+def count_transactions(simulator, function):
+    """number of bus transactions one call of function costs"""
+    transactions = simulator.transactions
+    function()
+    return simulator.transactions - transactions
+
+
+def bench_read_many():
+    """full snapshot of all co2, temperature and pressure registers,
+    one read per quantity vs merged register blocks"""
+    simulator = EE895Simulator(latency=BUS_LATENCY)
+    with EE895(simulator) as sensor:
+        one_by_one = count_transactions(simulator,
+                                        lambda: read_snapshot_one_by_one(sensor))
+        merged = count_transactions(simulator, lambda: sensor.read_many(SNAPSHOT))
+        assert merged == 4 and merged < one_by_one
+        readings = sensor.read_many(SNAPSHOT)
+        assert [readings[name].value for name in SNAPSHOT] == \
+            read_snapshot_one_by_one(sensor), "read_many differs from the getters"
+        before = measure(lambda: read_snapshot_one_by_one(sensor), 100)
+        after = measure(lambda: sensor.read_many(SNAPSHOT), 100)
+    return [("transactions, one read per quantity", one_by_one, "tx"),
+            ("transactions, read_many", merged, "tx"),
+            ("one read per quantity", before, "snapshots/s"),
+            ("read_many", after, "snapshots/s")]
+
+
+def single_shot_sensors(count, conversion_time=0.05):
+    """simulated sensors in single shot mode"""
+    sensors = []
+    for _ in range(count):
+        sensor = EE895(EE895Simulator(latency=BUS_LATENCY,
+                                      conversion_time=conversion_time))
+        sensor.change_measuring_mode(1)
+        sensors.append(sensor)
+    return sensors
+
+
+def blocking_shot(sensor, poll_interval=0.05):
+    """trigger a measurement and wait for it without asyncio"""
+    sensor.trigger_new_measurement()
+    while not sensor.data_ready():
+        time.sleep(poll_interval)
+    return sensor.read_many(ee895_i2c_library.SAMPLE_QUANTITIES)
+
+
+async def async_shots(sensors, rounds):
+    """trigger and read all sensors concurrently on one event loop"""
+    async_sensors = [AsyncEE895(sensor) for sensor in sensors]
+    for _ in range(rounds):
+        await asyncio.gather(*(sensor.trigger_and_read() for sensor in async_sensors))
+
+
+def bench_asyncio(count=20, rounds=5):
+    """single shot measurements of many sensors, blocking one after the
+    other vs concurrently on one event loop"""
+    sensors = single_shot_sensors(count)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for sensor in sensors:
+            blocking_shot(sensor)
+    before = count * rounds / (time.perf_counter() - start)
+    start = time.perf_counter()
+    asyncio.run(async_shots(sensors, rounds))
+    after = count * rounds / (time.perf_counter() - start)
+    return [("%d sensors, blocking loop" % count, before, "shots/s"),
+            ("%d sensors, AsyncEE895" % count, after, "shots/s")]
+
+
+def bench_fleet(sweeps=5):
+    """sweep latency of a SensorFleet as sensors and buses are added,
+    one sensor on every bus fails with NACKs"""
+    results = []
+    for buses in (1, 2, 4):
+        for sensors_per_bus in (1, 4, 8):
+            with SensorFleet() as fleet:
+                for bus in range(buses):
+                    for address in range(sensors_per_bus):
+                        simulator = EE895Simulator(0x40 + address, BUS_LATENCY)
+                        if address == 0 and sensors_per_bus > 1:
+                            simulator.nack_rate = 1.0
+                        fleet.add(EE895(simulator, 0x40 + address), bus)
+                start = time.perf_counter()
+                for _ in range(sweeps):
+                    fleet.sweep()
+                duration = (time.perf_counter() - start) / sweeps
+            results.append(("%d buses x %d sensors" % (buses, sensors_per_bus),
+                            duration * 1000, "ms/sweep"))
+    return results
+
+
+def bench_instrumentation():
+    """register reads per second without and with TransactionStats"""
+    with EE895(EE895Simulator()) as sensor:
+        before = measure(sensor.get_temp_c)
+    with EE895(EE895Simulator(), instrumentation=TransactionStats()) as sensor:
+        after = measure(sensor.get_temp_c)
+    return [("instrumentation off", before, "reads/s"),
+            ("TransactionStats", after, "reads/s")]
+
+
+def lossy_reads(sensor, reads, clock=time.perf_counter):
+    """share of failed reads and the longest read in seconds"""
+    failures = 0
+    worst = 0.0
+    for _ in range(reads):
+        start = clock()
+        try:
+            sensor.get_temp_c()
+        except EE895Error:
+            failures += 1
+        worst = max(worst, clock() - start)
+    return failures / reads, worst
+
+
+class FlakySimulator(EE895Simulator):
+    """EE895Simulator that counts bus resets, can acknowledge writes
+    without storing them and NACK register transactions only."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.resets = 0
+        self.lost_writes = 0
+        self.register_nacks = 0
+
+    def reset(self):
+        """count the reset"""
+        self.resets += 1
+        super().reset()
+
+    def write_read(self, i2c_address, buf, receiving_bytes):
+        """echo a write request without storing it while lost_writes last,
+        NACK register transactions while register_nacks last"""
+        if self.register_nacks and i2c_address == self.i2c_address:
+            self.register_nacks -= 1
+            self.transactions += 1
+            raise OSError(errno.EREMOTEIO, "Remote I/O error")
+        if self.lost_writes and buf[0] == FUNCTION_CODE_WRITE_REGISTER:
+            self.lost_writes -= 1
+            self.transactions += 1
+            self.sleep(self.latency)
+            return list(buf)
+        return super().write_read(i2c_address, buf, receiving_bytes)
+
+
+def bench_retry(reads=2000, fault_rate=0.05, deadline=0.05):
+    """lost readings on a noisy bus with 5 % NACKs and 5 % crc errors,
+    without and with RetryPolicy(attempts=4, deadline=50 ms), on a
+    VirtualClock; the bus reset after failures in a row and the read back
+    of verify_writes with injected faults"""
+    results = []
+    losses = {}
+    worst_reads = {}
+    for label, options in (("no retries", None),
+                           ("RetryPolicy", {"attempts": 4, "deadline": deadline})):
+        clock = VirtualClock()
+        simulator = EE895Simulator(latency=BUS_LATENCY, clock=clock.monotonic,
+                                   sleep=clock.sleep, seed=1)
+        simulator.nack_rate = simulator.crc_error_rate = fault_rate
+        retry = None if options is None else RetryPolicy(clock=clock.monotonic,
+                                                         sleep=clock.sleep, seed=1, **options)
+        with EE895(simulator, retry=retry) as sensor:
+            losses[label], worst_reads[label] = lossy_reads(sensor, reads, clock.monotonic)
+        results.append((label + ", lost readings", losses[label] * 100, "%"))
+        results.append((label + ", worst read", worst_reads[label] * 1000, "ms"))
+    assert losses["RetryPolicy"] < losses["no retries"]
+    # the last attempt starts before the deadline and takes one transaction
+    assert worst_reads["RetryPolicy"] <= deadline + BUS_LATENCY + 1e-9
+
+    clock = VirtualClock()
+    simulator = FlakySimulator(latency=BUS_LATENCY, clock=clock.monotonic, sleep=clock.sleep)
+    retry = RetryPolicy(attempts=4, reset_after=3, clock=clock.monotonic, sleep=clock.sleep)
+    with EE895(simulator, retry=retry) as sensor:
+        simulator.inject_faults(nacks=3)
+        sensor.get_temp_c()
+        assert simulator.resets == 1
+        simulator.inject_faults(nacks=2)
+        sensor.get_temp_c()
+        assert simulator.resets == 1, "failures in a row are counted from the last success"
+    results.append(("resets after 3 and 2 NACKs in a row", simulator.resets, ""))
+
+    for verify_writes in (False, True):
+        simulator.registers[ee895_i2c_library.REGISTER_CO2_CUSTOMER_OFFSET] = 0
+        retry = RetryPolicy(verify_writes=verify_writes, clock=clock.monotonic,
+                            sleep=clock.sleep)
+        with EE895(simulator, retry=retry) as sensor:
+            simulator.lost_writes = 1
+            transactions = simulator.transactions
+            sensor.change_co2_custom_offset(25)
+            stored = simulator.registers[ee895_i2c_library.REGISTER_CO2_CUSTOMER_OFFSET]
+        assert stored == (25 if verify_writes else 0)
+        results.append(("lost write, verify_writes=%s: transactions" % verify_writes,
+                        simulator.transactions - transactions, ""))
+
+    # a write stored by the sensor but failing on the echo must not leave
+    # the old value in the settings cache
+    with EE895(simulator) as sensor:
+        assert sensor.read_co2_measuring_interval() == 150
+        simulator.inject_faults(crc_errors=1)
+        try:
+            sensor.change_co2_measuring_interval(300)
+        except EE895Error:
+            pass
+        assert sensor.read_co2_measuring_interval() == 300
+        assert sensor.change_co2_measuring_interval(150)
+
+    # a trigger that started the conversion but failed on the echo is not
+    # sent again, a NACKed trigger is
+    retry = RetryPolicy(clock=clock.monotonic, sleep=clock.sleep)
+    with EE895(simulator, retry=retry) as sensor:
+        sensor.change_measuring_mode(1)
+        for faults in ({"crc_errors": 1}, {"nacks": 1}):
+            simulator.inject_faults(**faults)
+            sensor.trigger_new_measurement()
+            assert simulator._conversion_done is not None  # pylint: disable=protected-access
+            clock.sleep(simulator.conversion_time)
+            sensor.get_temp_c()
+        sensor.change_measuring_mode(0)
+    return results
+
+
+def concurrent_reads(sensor, callers, reads, pause=0.002):
+    """callers threads reading the same register reads times each"""
+    def caller():
+        for _ in range(reads):
+            sensor.get_co2_aver_with_pc()
+            time.sleep(pause)
+    threads = [threading.Thread(target=caller) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def bench_cache(reads=50, ttl=0.02):
+    """bus transactions of concurrent callers reading the same register,
+    without cache and with a RegisterCache (20 ms ttl to force refreshes)"""
+    results = []
+    cached = {}
+    for callers in (1, 2, 4, 8, 16):
+        for label, cache in (("no cache", None), ("RegisterCache", RegisterCache(ttl))):
+            simulator = EE895Simulator(latency=BUS_LATENCY)
+            with EE895(simulator, cache=cache) as sensor:
+                concurrent_reads(sensor, callers, reads)
+            results.append(("%2d callers, %s" % (callers, label),
+                            simulator.transactions, "tx"))
+        cached[callers] = simulator.transactions
+    # the ttl, not the number of callers, decides how often the bus is read
+    assert max(cached.values()) <= 2 * cached[1]
+    assert cache.coalesced > 0
+
+    # a value read while invalidate() is called is returned but not stored
+    cache = RegisterCache(60.0)
+    values = iter([[1], [2], [3]])
+
+    def invalidated_read():
+        cache.invalidate()
+        return next(values)
+
+    assert cache.get("key", invalidated_read) == [1]
+    assert cache.get("key", lambda: next(values)) == [2]
+    assert cache.get("key", lambda: next(values)) == [2]
+    return results
+
+
+def receive_pushes(client, count, delays):
+    """take count pushes and note how long after sampling they arrived"""
+    for index, sample in enumerate(client.subscribe()):
+        delays.append(time.time() - sample.timestamp)
+        if index + 1 == count:
+            return
+
+
+def bench_collector(requests=2000, pushes=20):
+    """request latency of a CollectorClient and push delay with many
+    subscribed clients, sampling one simulated sensor every 10 ms"""
+    socket_path = os.path.join(tempfile.mkdtemp(), "ee895.sock")
+    collector = Collector(socket_path, interval=0.01)
+    collector.add(EE895(EE895Simulator()))
+    results = []
+    with collector:
+        time.sleep(0.05)
+        with CollectorClient(socket_path) as client:
+            start = time.perf_counter()
+            for _ in range(requests):
+                client.get_temp_c()
+            latency = (time.perf_counter() - start) / requests
+            assert client.history(0) == [] and len(client.history(3)) == 3
+        results.append(("get_temp_c round trip", latency * 1e6, "us"))
+        for clients in (1, 8, 32):
+            delays = []
+            threads = [threading.Thread(target=receive_pushes,
+                                        args=(CollectorClient(socket_path), pushes, delays))
+                       for _ in range(clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            results.append(("%2d subscribers, mean push delay" % clients,
+                            sum(delays) / len(delays) * 1e6, "us"))
+    return results
+
+
+def spin_reader(name, ready, stop, snapshots, torn):
+    """take snapshots until stopped, counting the ones that mix two samples"""
+    with SharedMemoryReader(name) as reader:
+        out = np.zeros((), SHARED_SAMPLE)
+        ready.release()
+        count = 0
+        mixed = 0
+        while not stop.is_set():
+            reader.snapshot(out)
+            value = out["timestamp"]
+            if any(out[quantity] != np.float32(value) for quantity in MEASUREMENT_QUANTITIES):
+                mixed += 1
+            count += 1
+        del out
+    snapshots.value += count
+    torn.value += mixed
+
+
+def bench_shared_memory(snapshots=100000, duration=0.5):
+    """latency of a consistent snapshot and publisher throughput with reader
+    processes spinning on the block; every field of a sample carries the same
+    value, a snapshot mixing two samples would be counted as torn"""
+    name = "ee895_benchmark_%d" % os.getpid()
+    results = []
+    with SharedMemoryPublisher(name) as publisher:
+        publisher.publish({quantity: 0.0 for quantity in MEASUREMENT_QUANTITIES}, 0.0)
+        with SharedMemoryReader(name) as reader:
+            out = np.zeros((), SHARED_SAMPLE)
+            start = time.perf_counter()
+            for _ in range(snapshots):
+                reader.snapshot(out)
+            results.append(("reader snapshot", (time.perf_counter() - start) / snapshots * 1e9,
+                            "ns"))
+            start = time.perf_counter()
+            for _ in range(snapshots):
+                reader.view["co2_average_pc"]  # pylint: disable=pointless-statement
+            results.append(("reader view field", (time.perf_counter() - start) / snapshots * 1e9,
+                            "ns"))
+            del out
+        context = multiprocessing.get_context("spawn")
+        for readers in (0, 1, 4, 16):
+            ready = context.Semaphore(0)
+            stop = context.Event()
+            counts = context.Value("q", 0)
+            torn = context.Value("q", 0)
+            processes = [context.Process(target=spin_reader, args=(name, ready, stop, counts, torn))
+                         for _ in range(readers)]
+            for process in processes:
+                process.start()
+            for _ in processes:
+                ready.acquire()  # pylint: disable=consider-using-with
+            published = 0
+            start = time.perf_counter()
+            while time.perf_counter() - start < duration:
+                value = float(published % 1000)
+                publisher.publish({quantity: value for quantity in MEASUREMENT_QUANTITIES},
+                                  value)
+                published += 1
+            elapsed = time.perf_counter() - start
+            stop.set()
+            for process in processes:
+                process.join()
+            assert torn.value == 0, "%d torn snapshots" % torn.value
+            results.append(("%2d readers, samples published" % readers,
+                            published / elapsed / 1000, "k/s"))
+            if readers:
+                results.append(("%2d readers, snapshots taken" % readers,
+                                counts.value / elapsed / 1000, "k/s"))
+    return results
+
+
+def bench_timeseries(queries=200):
+    """a month of 15 s samples in a TimeSeries: appends and window queries,
+    against the mean of a list of tuples filtered in python"""
+    series = TimeSeries.for_duration(30 * 86400, 15)
+    samples = []
+    start = time.perf_counter()
+    for index in range(series.capacity + series.capacity // 3):
+        series.append(index * 15.0, 23.0, 500.0 + index % 100, 978.0, 0)
+    append = (time.perf_counter() - start) / (series.capacity + series.capacity // 3)
+    for index in range(series.capacity):
+        samples.append((index * 15.0, 23.0, 500.0 + index % 100, 978.0, 0))
+    hour = series.since(3600)
+    day = series.since(86400)
+    results = [("memory per sensor and month", series.nbytes / 1e6, "MB"),
+               ("append", append * 1e6, "us")]
+    for label, query in (
+            ("mean co2, last hour", lambda: series.mean("co2", hour)),
+            ("percentiles co2, last day", lambda: series.percentile("co2", (5, 50, 95), day)),
+            ("rate of change co2, last hour", lambda: series.rate_of_change("co2", hour)),
+            ("max co2, whole month", lambda: series.maximum("co2")),
+            ("rolling mean co2 (1 h), whole month", lambda: series.rolling("co2", 240)),
+            ("python list: mean co2, last hour",
+             lambda: sum(sample[2] for sample in samples if sample[0] >= samples[-1][0] - 3600)
+             / sum(1 for sample in samples if sample[0] >= samples[-1][0] - 3600))):
+        start = time.perf_counter()
+        for _ in range(queries):
+            query()
+        results.append((label, (time.perf_counter() - start) / queries * 1e6, "us"))
+    return results
+
+
+def bench_binlog(samples=100000):
+    """write throughput, size and scan speed of a binary log against the
+    text the continuous mode example prints (which has no timestamp)"""
+    directory = tempfile.mkdtemp()
+    text_path = os.path.join(directory, "samples.txt")
+    log_path = os.path.join(directory, "samples.ee895log")
+    values = [(23.0 + index % 300 / 100, 400.0 + index % 1000, 978.1)
+              for index in range(samples)]
+    start = time.perf_counter()
+    with open(text_path, "w", encoding="utf-8") as text_file:
+        for temperature, co2, pressure in values:
+            print('%0.2f °C' % temperature, ",", end="", file=text_file)
+            print('%0.0f ppm' % co2, ",", end="", file=text_file)
+            print('%0.1f mbar' % pressure, file=text_file)
+    text_write = time.perf_counter() - start
+    start = time.perf_counter()
+    with BinaryLogWriter(log_path, [0] * 16) as log:
+        for index, (temperature, co2, pressure) in enumerate(values):
+            log.write({"temperature_c": temperature, "co2_average_pc": co2,
+                       "pressure_mbar": pressure, "status_details": 0}, 1e9 + index * 15)
+    log_write = time.perf_counter() - start
+    start = time.perf_counter()
+    with open(text_path, encoding="utf-8") as text_file:
+        co2_values = [float(line.split(",")[1].split()[0]) for line in text_file]
+    text_mean = sum(co2_values) / len(co2_values)
+    text_scan = time.perf_counter() - start
+    start = time.perf_counter()
+    log_mean = BinaryLogReader(log_path).values("co2_average_pc").mean()
+    log_scan = time.perf_counter() - start
+    assert abs(text_mean - log_mean) < 1e-6, "the formats disagree"
+    out_of_range_path = os.path.join(directory, "out_of_range.ee895log")
+    with BinaryLogWriter(out_of_range_path, [0] * 16) as log:
+        log.write({"temperature_c": 400.0, "co2_average_pc": math.inf,
+                   "pressure_mbar": 4000.0, "status_details": 0x10000}, 1e9)
+    out_of_range = BinaryLogReader(out_of_range_path)
+    assert all(math.isnan(out_of_range.values(field.name)[0]) for field in out_of_range.fields)
+    del out_of_range
+    reader = BinaryLogReader(log_path)
+    start = time.perf_counter()
+    for index in range(1000):
+        reader.range(1e9 + index * 1500, 1e9 + index * 1500 + 3600)
+    range_query = (time.perf_counter() - start) / 1000
+    return [("text: write", samples / text_write / 1000, "k samples/s"),
+            ("binary log: write", samples / log_write / 1000, "k samples/s"),
+            ("text: size", os.path.getsize(text_path) / samples, "bytes/sample"),
+            ("binary log: size", os.path.getsize(log_path) / samples, "bytes/sample"),
+            ("text: mean co2 scan", samples / text_scan / 1e6, "M samples/s"),
+            ("binary log: mean co2 scan", samples / log_scan / 1e6, "M samples/s"),
+            ("binary log: one hour range query", range_query * 1e6, "us")]
+
+
+def replayed_session(transport, reads):
+    """read_many and get_all_measurements reads times each, failures included"""
+    sensor = EE895(transport, retry=RetryPolicy(attempts=2, backoff=0.0))
+    results = []
+    for _ in range(reads):
+        for read in (lambda: sensor.read_many(ee895_i2c_library.SAMPLE_QUANTITIES),
+                     sensor.get_all_measurements):
+            try:
+                results.append(read())
+            except EE895Error as exception:
+                results.append(type(exception).__name__)
+    return results
+
+
+def bench_replay(reads=2000, fault_rate=0.05):
+    """record a session with NACKs and crc errors from the simulator, then
+    replay it; the replayed session has to decode exactly the same"""
+    simulator = EE895Simulator(seed=1)
+    simulator.nack_rate = simulator.crc_error_rate = fault_rate
+    capture_path = os.path.join(tempfile.mkdtemp(), "session.ee895cap")
+    with RecordingTransport(simulator, capture_path) as recorder:
+        start = time.perf_counter()
+        recorded = replayed_session(recorder, reads)
+        record_time = time.perf_counter() - start
+    start = time.perf_counter()
+    replayed = replayed_session(ReplayTransport(capture_path), reads)
+    replay_time = time.perf_counter() - start
+    assert replayed == recorded, "the replay decodes differently"
+    return [("capture size", os.path.getsize(capture_path) / recorder.transactions,
+             "bytes/tx"),
+            ("simulator with recording", recorder.transactions / record_time / 1000, "k tx/s"),
+            ("replay", recorder.transactions / replay_time / 1000, "k tx/s")]
+
+
+def bench_single_shot(rounds=10):
+    """end-to-end single shot latency and host cpu time per shot, the
+    trigger and poll loop of blocking_shot one sensor after the other vs
+    SingleShotEngine, sensors with a 50 ms conversion time"""
+    results = []
+    for count in (1, 8):
+        sensors = single_shot_sensors(count)
+        latencies = []
+        cpu = time.process_time()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for sensor in sensors:
+                shot_start = time.perf_counter()
+                blocking_shot(sensor)
+                latencies.append(time.perf_counter() - shot_start)
+        round_time = (time.perf_counter() - start) / rounds
+        cpu = (time.process_time() - cpu) / (rounds * count)
+        results += [("%d sensors, blocking loop: round" % count, round_time * 1e3, "ms"),
+                    ("%d sensors, blocking loop: shot latency" % count,
+                     sum(latencies) / len(latencies) * 1e3, "ms"),
+                    ("%d sensors, blocking loop: cpu per shot" % count, cpu * 1e3, "ms")]
+        engine = SingleShotEngine()
+        for index, sensor in enumerate(sensors):
+            engine.add(sensor, index)
+        for _ in range(5):
+            engine.shoot()  # learn the conversion times
+        latencies = []
+        cpu = time.process_time()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            shots = engine.shoot()
+            assert all(shot.error is None for shot in shots), "a shot failed"
+            latencies += [shot.latency for shot in shots]
+        round_time = (time.perf_counter() - start) / rounds
+        cpu = (time.process_time() - cpu) / (rounds * count)
+        results += [("%d sensors, engine: round" % count, round_time * 1e3, "ms"),
+                    ("%d sensors, engine: shot latency" % count,
+                     sum(latencies) / len(latencies) * 1e3, "ms"),
+                    ("%d sensors, engine: cpu per shot" % count, cpu * 1e3, "ms")]
+    return results
+
+
+def bench_fast_path(samples=1000, fault_rate=0.01):
+    """cost per sample and wrong samples let through on a bus that flips
+    the last byte of 1 % of the responses: the register protocol, the
+    simplified protocol and FastPathSampler switching between them"""
+    truth = (23.41, 500.0, 978.1)
+
+    def wrong(values):
+        return any(abs(value - true) > 0.11 for value, true in zip(values, truth))
+
+    def register_sample():
+        readings = sensor.read_many(ee895_i2c_library.SAMPLE_QUANTITIES)
+        return [readings[name].value for name in ee895_i2c_library.SAMPLE_QUANTITIES]
+
+    results = []
+    for label in ("register protocol", "simplified protocol", "FastPathSampler"):
+        simulator = EE895Simulator(latency=BUS_LATENCY, seed=1)
+        simulator.crc_error_rate = fault_rate
+        sensor = EE895(simulator, retry=RetryPolicy(backoff=0.0))
+        sampler = FastPathSampler(sensor)
+        read = {"register protocol": register_sample,
+                "simplified protocol": sensor.get_all_measurements,
+                "FastPathSampler": lambda: sampler.sample()[1:4]}[label]
+        errors = 0
+        start = time.perf_counter()
+        for _ in range(samples):
+            errors += wrong(read())
+        duration = time.perf_counter() - start
+        results += [("%s: time per sample" % label, duration / samples * 1e3, "ms"),
+                    ("%s: transactions per sample" % label,
+                     simulator.transactions / samples, "tx"),
+                    ("%s: wrong samples" % label, errors, "")]
+    for path in ("simplified", "status", "register"):
+        results.append(("FastPathSampler: %s reads" % path, sampler.stats[path]["reads"], ""))
+
+    # a failing status read escalates to the register protocol
+    simulator = FlakySimulator()
+    sampler = FastPathSampler(EE895(simulator), cross_check_interval=0, status_interval=1)
+    simulator.register_nacks = 1
+    sample = sampler.sample()
+    assert sample.path == "register" and sample.reason == "error"
+    assert sampler.stats["reasons"] == {"error": 1}
+    return results
+
+
+def virtual_sensors(clock, count):
+    """sensors on simulators that spend their bus time on a VirtualClock"""
+    return [EE895(EE895Simulator(latency=BUS_LATENCY, clock=clock.monotonic,
+                                 sleep=clock.sleep)) for _ in range(count)]
+
+
+def bench_scheduler(hours=24, interval=15.0):
+    """a day of 15 s samples on a VirtualClock: drift of the example loop
+    (work, then sleep) against the scheduler, and the start jitter of 8
+    sensors on one bus started together or staggered"""
+    clock = VirtualClock()
+    sensor = virtual_sensors(clock, 1)[0]
+    runs = int(hours * 3600 / interval)
+    for _ in range(runs):
+        last_start = clock.now
+        sensor.read_many(ee895_i2c_library.SAMPLE_QUANTITIES)
+        clock.sleep(interval)
+    results = [("example loop: drift after %d h" % hours,
+                last_start - (runs - 1) * interval, "s")]
+    clock = VirtualClock()
+    sensor = virtual_sensors(clock, 1)[0]
+    scheduler = SamplingScheduler.virtual(clock)
+    job = scheduler.add_sensor(sensor, lambda readings: None, interval)
+    start = time.perf_counter()
+    scheduler.run(runs=runs)
+    elapsed = time.perf_counter() - start
+    results += [("scheduler: drift after %d h" % hours, job.jitter[-1], "s"),
+                ("scheduler: real time for %d h" % hours, elapsed * 1e3, "ms")]
+    for label, phase in (("started together", 0.0), ("staggered", None)):
+        clock = VirtualClock()
+        scheduler = SamplingScheduler.virtual(clock)
+        jobs = [scheduler.add_sensor(sensor, lambda readings: None, interval, phase=phase)
+                for sensor in virtual_sensors(clock, 8)]
+        scheduler.run(duration=3600)
+        results.append(("8 sensors %s: max jitter" % label,
+                        max(job.stats()["jitter_max"] for job in jobs) * 1e3, "ms"))
+    # EE895.stream started 8 s after a measurement, with data ready left over
+    clock = VirtualClock()
+    sensor = virtual_sensors(clock, 1)[0]
+    clock.sleep(interval - 7.0)
+    sensor.data_ready()
+    lags = [sample.timestamp % interval for sample in
+            sensor.stream(max_samples=20, clock=clock.monotonic, sleep=clock.sleep)]
+    assert lags[-1] <= interval / ee895_i2c_library.STREAM_POLLS_PER_INTERVAL
+    results += [("stream: first sample after the measurement", lags[0], "s"),
+                ("stream: 20th sample after the measurement", lags[-1], "s")]
+    return results
+
+
+def aggregated_samples(count, interval=15.0, start=1.7e9, seed=1):
+    """samples with jitter, a gap of 100 minutes and a status flag"""
+    generator = random.Random(seed)
+    return [(start + index * interval + generator.random(),
+             23.0 + 2.0 * math.sin(index / 500.0), 450.0 + generator.random() * 100.0,
+             978.0 + generator.random(), 0x4 if index == count // 3 else 0)
+            for index in range(count) if not count // 2 <= index < count // 2 + 400]
+
+
+def bench_aggregation(samples=100000, sensors=1000, interval=15.0):
+    """samples of 15 s aggregated into minute, hour and day windows: update
+    cost, a dashboard query against recomputing it from the raw samples,
+    restart and late samples, memory per sensor of a fleet"""
+    stream = aggregated_samples(samples, interval)
+    aggregator = Aggregator(interval=interval)
+    start = time.perf_counter()
+    for sample in stream:
+        aggregator.add(*sample)
+    update = (time.perf_counter() - start) / len(stream)
+    timestamps = np.array([sample[0] for sample in stream])
+    co2 = np.array([sample[2] for sample in stream], np.float32)
+    hours = aggregator.tier(3600).history()
+    for row in hours[::50]:
+        selected = co2[(timestamps >= row["start"]) & (timestamps < row["start"] + 3600)]
+        assert row["count"] == len(selected)
+        assert row["co2_max"] == selected.max() and row["co2_last"] == selected[-1]
+        assert abs(row["co2_mean"] - selected.mean(dtype=np.float64)) < 1e-3
+    assert any(row["flags"] & FLAG_STATUS for row in hours)
+
+    def recompute():
+        """hourly min, mean, max and last co2 from the raw samples"""
+        bounds = np.flatnonzero(np.diff(timestamps // 3600)) + 1
+        starts = np.concatenate(([0], bounds))
+        counts = np.diff(np.concatenate((starts, [len(co2)])))
+        return (np.minimum.reduceat(co2, starts), np.add.reduceat(co2, starts) / counts,
+                np.maximum.reduceat(co2, starts), co2[np.concatenate((bounds, [len(co2)])) - 1])
+    results = [("update per sample, 3 tiers", update * 1e6, "us")]
+    for label, query in (("hourly co2 of %d days, from the tier" % (samples * interval // 86400),
+                          lambda: aggregator.tier(3600).history()["co2_mean"]),
+                         ("recomputed from the raw samples", recompute)):
+        start = time.perf_counter()
+        for _ in range(20):
+            query()
+        results.append((label, (time.perf_counter() - start) / 20 * 1e6, "us"))
+
+    # late samples: every pair swapped, 15 s apart within the lateness of 30 s
+    swapped = list(stream)
+    for index in range(0, len(swapped) - 1, 2):
+        if swapped[index + 1][0] - swapped[index][0] < interval * 2:
+            swapped[index], swapped[index + 1] = swapped[index + 1], swapped[index]
+    late = Aggregator(interval=interval)
+    for sample in swapped:
+        late.add(*sample)
+    fields = ["start", "count", "co2_min", "co2_max", "co2_last"]
+    assert late.dropped == 0
+    assert np.array_equal(late.tier(60).history()[fields], aggregator.tier(60).history()[fields])
+
+    # a restart after a flush, the samples after the flush are lost and sent again
+    directory = tempfile.mkdtemp()
+    try:
+        resumed = Aggregator(interval=interval, directory=directory, flush_interval=math.inf)
+        for sample in stream[:len(stream) // 3]:
+            resumed.add(*sample)
+        resumed.flush()
+        for sample in stream[len(stream) // 3:len(stream) // 3 + 1000]:
+            resumed.add(*sample)
+        resumed.tiers[0].flush()
+        start = time.perf_counter()
+        resumed = Aggregator(interval=interval, directory=directory, flush_interval=math.inf)
+        restart = time.perf_counter() - start
+        for sample in stream[len(stream) // 3:]:
+            resumed.add(*sample)
+        resumed.close()
+        for tier in aggregator.tiers:
+            _, records = read_aggregates(os.path.join(directory, "%ds.agg" % tier.width))
+            assert records[-len(tier):].tobytes() == tier.history().tobytes()
+        disk = sum(os.path.getsize(os.path.join(directory, name))
+                   for name in os.listdir(directory))
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+    results += [("restart from the saved state", restart * 1e3, "ms"),
+                ("on disk for %d days" % (samples * interval // 86400), disk / 1e3, "kB")]
+
+    hour = aggregated_samples(int(3600 / interval) + 1, interval)
+    tracemalloc.start()
+    fleet = [Aggregator(interval=interval) for _ in range(sensors)]
+    for aggregator in fleet:
+        for sample in hour:
+            aggregator.add(*sample)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    results += [("memory per sensor, %d sensors" % sensors, memory / sensors / 1e3, "kB"),
+                ("of it closed windows kept", fleet[0].nbytes / 1e3, "kB")]
+    return results
+
+
+def bench_events(hours=1, interval=15.0):
+    """an hour of a co2 threshold, a rate alarm and status changes: bus
+    transactions and event latency of the EventEngine against reading
+    everything every second or every measuring interval"""
+    duration = hours * 3600
+    # the sensor measures at multiples of interval, the watching starts between
+    phase = interval * 0.37
+
+    def environment(simulator, clock):
+        """co2 swinging around 1000 ppm, the temperature too high for 5 min"""
+        def sleep(seconds):
+            clock.sleep(seconds)
+            simulator.set_environment(
+                co2=700.0 + 500.0 * math.sin(2 * math.pi * clock.now / 1800),
+                temperature=61.0 if 1200 <= clock.now % 3600 < 1500 else 23.0)
+        return sleep
+
+    def latency(events):
+        """mean seconds from the measurement to its event"""
+        return sum(event.timestamp % interval for event in events) / len(events)
+
+    def naive(poll_interval):
+        """read the values and the status every poll_interval"""
+        clock = VirtualClock()
+        sensor = virtual_sensors(clock, 1)[0]
+        sleep = environment(sensor.bus, clock)
+        sleep(phase)
+        threshold = Threshold("co2_average_pc", 1000.0, None, 50.0)
+        events = []
+        status = None
+        while clock.now < phase + duration:
+            readings = sensor.read_many(ee895_i2c_library.SAMPLE_QUANTITIES)
+            event = threshold.update(clock.now, readings["co2_average_pc"].value)
+            if event is not None:
+                events.append(event)
+            new_status = sensor.status_details()
+            if status is not None and new_status != status:
+                events.append(Event("status", "status_details", clock.now,
+                                    bool(new_status), new_status, status, readings))
+            status = new_status
+            sleep(poll_interval)
+        return sensor.bus.transactions, events
+
+    def engine(watch_values):
+        """the EventEngine with status callbacks and, if watch_values, the
+        threshold and a rate alarm"""
+        clock = VirtualClock()
+        sensor = virtual_sensors(clock, 1)[0]
+        events = []
+        threads = set()
+
+        def callback(event):
+            threads.add(threading.current_thread().name)
+            events.append(event)
+        sleep = environment(sensor.bus, clock)
+        sleep(phase)
+        events_engine = EventEngine(sensor, clock=clock.monotonic, sleep=sleep)
+        events_engine.on_status(callback)
+        if watch_values:
+            events_engine.on_threshold("co2_average_pc", 1000.0, callback, 50.0)
+            events_engine.on_rate("co2_average_pc", 80.0, callback, 120.0)
+        events_engine.run(duration)
+        events_engine.stop()
+        assert threads == {"ee895 dispatcher"}
+        return sensor.bus.transactions, events
+
+    results = []
+    expected = None
+    for label, run in (("all values every second", lambda: naive(1.0)),
+                       ("all values every interval", lambda: naive(interval)),
+                       ("engine", lambda: engine(True)),
+                       ("engine, status only", lambda: engine(False))):
+        transactions, events = run()
+        changes = [(event.kind, event.active) for event in events if event.kind != "rate"]
+        if expected is None:
+            expected = changes
+        assert changes == expected or changes == [
+            change for change in expected if change[0] == "status"]
+        results += [(label + ": transactions", transactions / hours, "per hour"),
+                    (label + ": event latency", latency(events), "s")]
+
+    # a NACK on the read for a status event: the event comes with the next poll
+    clock = VirtualClock()
+    sensor = virtual_sensors(clock, 1)[0]
+    sensor.bus.set_environment(co2=20000.0)
+    events = []
+    events_engine = EventEngine(sensor, clock=clock.monotonic, sleep=clock.sleep)
+    events_engine.on_status(events.append, mask=0x01)
+    read_many = sensor.read_many
+
+    def failing_read_many(quantities):
+        """the first read of the status quantities is not acknowledged"""
+        if not events_engine.stats["errors"]:
+            sensor.bus.inject_faults(nacks=1)
+        return read_many(quantities)
+    sensor.read_many = failing_read_many
+    events_engine.run(duration=4 * interval)
+    events_engine.stop()
+    assert events_engine.stats["errors"] == 1
+    assert [(event.kind, event.value) for event in events] == [("status", 0x01)]
+    return results
+
+
+def started(*arguments, runs=5):
+    """fastest of runs starts of a python process with arguments"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    fastest = math.inf
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + list(arguments), cwd=directory, check=True,
+                       stdout=subprocess.DEVNULL)
+        fastest = min(fastest, time.perf_counter() - start)
+    return fastest
+
+
+def bench_startup():
+    """import time of the library and cold start of the command line tool"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, ee895_i2c_library; "
+         "print(' '.join(sorted(sys.modules)))"],
+        cwd=directory, check=True, capture_output=True, text=True).stdout.split()
+    assert "numpy" not in loaded, "importing the library loads numpy"
+    interpreter = started("-c", "pass")
+    library = started("-c", "import ee895_i2c_library") - interpreter
+    cold_start = started("ee895_i2c_cli.py", "--simulate", "read") - interpreter
+    assert library < IMPORT_BUDGET, "library import takes %.3f s" % library
+    assert cold_start < COLD_START_BUDGET, "cold start takes %.3f s" % cold_start
+    return [("python start", interpreter * 1e3, "ms"),
+            ("import ee895_i2c_library", library * 1e3, "ms"),
+            ("budget", IMPORT_BUDGET * 1e3, "ms"),
+            ("ee895 --simulate read", cold_start * 1e3, "ms"),
+            ("budget", COLD_START_BUDGET * 1e3, "ms")]
+
+
+BENCHMARKS = {
+    "bus_session": bench_bus_session,
+    "crc16": bench_crc16,
+    "IEEE754": bench_IEEE754,
+    "read_many": bench_read_many,
+    "asyncio": bench_asyncio,
+    "fleet": bench_fleet,
+    "instrumentation": bench_instrumentation,
+    "retry": bench_retry,
+    "cache": bench_cache,
+    "collector": bench_collector,
+    "shared_memory": bench_shared_memory,
+    "timeseries": bench_timeseries,
+    "binlog": bench_binlog,
+    "replay": bench_replay,
+    "single_shot": bench_single_shot,
+    "fast_path": bench_fast_path,
+    "scheduler": bench_scheduler,
+    "aggregation": bench_aggregation,
+    "events": bench_events,
+    "startup": bench_startup,
+}
+
+
+def main(names):
+    """run the benchmarks given by name, all of them without names"""
+    for name in names or BENCHMARKS:
+        print(name)
+        for label, value, unit in BENCHMARKS[name]():
+            print("    %-40s %12.1f %s" % (label, value, unit))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Binary append-only log of EE895 samples.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+
+A log file is a header followed by fixed size records:
+
+    header  magic "EE895LOG", version, header size, record size, field
+            count, serial number (16 bytes), per field: register address,
+            type code and scale
+    record  unix timestamp (float64), per field the value divided by the
+            scale as int16 ("h"), uint16 ("H") or float32 ("f")
+"""
+
+import bisect
+import math
+import os
+import struct
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from ee895_i2c_library import REGISTER_MAP, SAMPLE_QUANTITIES
+
+LOG_MAGIC = b"EE895LOG"
+LOG_VERSION = 1
+LOG_HEADER = struct.Struct("<8sHHHH16s")
+LOG_FIELD = struct.Struct("<Hc5xd")
+LOG_TYPES = {"h": "<i2", "H": "<u2", "f": "<f4"}
+# stored for a missing value of an integer field
+LOG_MISSING = {"h": -0x8000, "H": 0xFFFF}
+# stored values of the integer fields, values outside are logged as missing
+LOG_LIMITS = {"h": (-0x7FFF, 0x7FFF), "H": (0, 0xFFFE)}
+# records between two entries of the sparse time index
+INDEX_STRIDE = 1024
+
+LogField = namedtuple("LogField", ["name", "code", "scale"])
+
+# 16 bytes per record, the resolution of the simplified protocol
+DEFAULT_LOG_FIELDS = (
+    LogField("temperature_c", "h", 0.01),
+    LogField("co2_average_pc", "h", 1.0),
+    LogField("pressure_mbar", "h", 0.1),
+    LogField("status_details", "H", 1.0),
+)
+
+
+def record_dtype(fields):
+    """numpy dtype of a record with fields"""
+    return np.dtype([("timestamp", "<f8")]
+                    + [(field.name, LOG_TYPES[field.code]) for field in fields])
+
+
+def pack_header(serial_number, fields):
+    """header of a log file"""
+    header_size = LOG_HEADER.size + LOG_FIELD.size * len(fields)
+    header = LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION, header_size,
+                             record_dtype(fields).itemsize, len(fields),
+                             bytes(serial_number))
+    return header + b"".join(LOG_FIELD.pack(REGISTER_MAP[field.name].address,
+                                            field.code.encode(), field.scale)
+                             for field in fields)
+
+
+def unpack_header(log_file):
+    """(header size, serial number, fields) of an open log file"""
+    header = log_file.read(LOG_HEADER.size)
+    if len(header) < LOG_HEADER.size or not header.startswith(LOG_MAGIC):
+        raise ValueError("not an EE895 log file")
+    _, version, header_size, record_size, count, serial_number = LOG_HEADER.unpack(header)
+    if version != LOG_VERSION:
+        raise ValueError("unsupported EE895 log version %d" % version)
+    names = {register.address: name for name, register in REGISTER_MAP.items()}
+    fields = []
+    for _ in range(count):
+        address, code, scale = LOG_FIELD.unpack(log_file.read(LOG_FIELD.size))
+        fields.append(LogField(names[address], code.decode(), scale))
+    fields = tuple(fields)
+    if record_dtype(fields).itemsize != record_size or header_size != log_file.tell():
+        raise ValueError("corrupt EE895 log header")
+    return header_size, list(serial_number), fields
+
+
+def scaled(records, field):
+    """values of field in records as float64, missing ones are nan"""
+    raw = records[field.name]
+    values = raw.astype(np.float64)
+    if field.code != "f":
+        values *= field.scale
+        values[raw == LOG_MISSING[field.code]] = math.nan
+    return values
+
+
+class BinaryLogWriter():
+    """Appends samples to a log file in batches.
+
+    Records are collected in a preallocated batch and written when it is
+    full; the file is fsync'd when fsync_interval seconds passed since the
+    last fsync. An existing file is continued: the header has to match and
+    a record cut short by a crash is truncated. The header of a new file is
+    written to a temporary file first, so a log never has half a header.
+    """
+
+    def __init__(self, path, serial_number, fields=DEFAULT_LOG_FIELDS, batch=64,
+                 fsync_interval=60.0, clock=time.monotonic):
+        self.path = path
+        self.serial_number = list(serial_number)
+        self.fields = tuple(LogField(*field) for field in fields)
+        self.fsync_interval = fsync_interval
+        self.clock = clock
+        self.dtype = record_dtype(self.fields)
+        self.recovered_bytes = 0
+        if not os.path.exists(path):
+            temporary_path = path + ".tmp"
+            with open(temporary_path, "wb") as log_file:
+                log_file.write(pack_header(self.serial_number, self.fields))
+                log_file.flush()
+                os.fsync(log_file.fileno())
+            os.replace(temporary_path, path)
+        self._file = open(path, "r+b")  # pylint: disable=consider-using-with
+        header_size, log_serial_number, log_fields = unpack_header(self._file)
+        if log_serial_number != self.serial_number or log_fields != self.fields:
+            self._file.close()
+            raise ValueError("%s logs another sensor or other fields" % path)
+        size = self._file.seek(0, os.SEEK_END)
+        self.recovered_bytes = (size - header_size) % self.dtype.itemsize
+        if self.recovered_bytes:
+            self._file.truncate(size - self.recovered_bytes)
+        self._file.seek(0, os.SEEK_END)
+        self._batch = np.zeros(batch, self.dtype)
+        self._pending = 0
+        self._last_fsync = clock()
+
+    @classmethod
+    def for_sensor(cls, path, sensor, **options):
+        """log file for an EE895, its header holds the serial number"""
+        return cls(path, sensor.read_serial_number(), **options)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, readings, timestamp=None):
+        """log a dict of quantity => Reading or number, quantities missing
+        in readings and values out of the range of their field are logged
+        as missing"""
+        record = [time.time() if timestamp is None else timestamp]
+        for name, code, scale in self.fields:
+            value = readings.get(name)
+            value = getattr(value, "value", value)
+            if code == "f":
+                record.append(math.nan if value is None else value)
+            elif value is None or not math.isfinite(value):
+                record.append(LOG_MISSING[code])
+            else:
+                value = round(value / scale)
+                low, high = LOG_LIMITS[code]
+                record.append(value if low <= value <= high else LOG_MISSING[code])
+        self._batch[self._pending] = tuple(record)
+        self._pending += 1
+        if self._pending == len(self._batch):
+            self.flush()
+
+    def write_sample(self, sample, timestamp=None):
+        """log a Sample of EE895.stream, its timestamp is monotonic so the
+        record gets the current time unless timestamp is given"""
+        self.write(dict(zip(SAMPLE_QUANTITIES, sample[1:])), timestamp)
+
+    def flush(self, fsync=False):
+        """write the collected records, fsync when asked to or when the
+        fsync interval passed"""
+        if self._pending:
+            self._file.write(self._batch[:self._pending].tobytes())
+            self._pending = 0
+        self._file.flush()
+        if fsync or self.clock() - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = self.clock()
+
+    def close(self):
+        """write everything to disk and close the file"""
+        if not self._file.closed:
+            self.flush(fsync=True)
+            self._file.close()
+
+
+class BinaryLogReader():
+    """Reads a log file through numpy.memmap without copying the records.
+
+    Timestamps are expected in order; every INDEX_STRIDE-th of them is
+    kept in a sparse index so a time range is found by touching only a
+    few pages of the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as log_file:
+            header_size, self.serial_number, self.fields = unpack_header(log_file)
+            size = log_file.seek(0, os.SEEK_END)
+        self.dtype = record_dtype(self.fields)
+        count = (size - header_size) // self.dtype.itemsize
+        if count:
+            self.records = np.memmap(path, self.dtype, "r", header_size, (count,))
+        else:
+            self.records = np.zeros(0, self.dtype)
+        self.index = np.array(self.records["timestamp"][::INDEX_STRIDE])
+
+    def __len__(self):
+        return len(self.records)
+
+    def range(self, start=None, end=None):
+        """records with start <= timestamp < end, a view of the file"""
+        low = 0 if start is None else self._find(start)
+        high = len(self.records) if end is None else self._find(end)
+        return self.records[low:high]
+
+    def _find(self, timestamp):
+        """index of the first record at or after timestamp"""
+        block = max(bisect.bisect_left(self.index, timestamp) - 1, 0)
+        low = block * INDEX_STRIDE
+        timestamps = np.array(self.records["timestamp"][low:low + 2 * INDEX_STRIDE])
+        return low + int(np.searchsorted(timestamps, timestamp, "left"))
+
+    def values(self, name, start=None, end=None):
+        """values of a field scaled to float64, missing ones are nan"""
+        field = next(field for field in self.fields if field.name == name)
+        return scaled(self.range(start, end), field)
+
+    def export_csv(self, csv_file, start=None, end=None, delimiter=","):
+        """write the records as csv text to an open file"""
+        csv_file.write(delimiter.join(["timestamp"] + [field.name for field in self.fields])
+                       + "\n")
+        formats = ["%.3f"] + ["%.7g" if field.code == "f" else
+                              "%%.%df" % max(0, -math.floor(math.log10(field.scale)))
+                              for field in self.fields]
+        records = self.range(start, end)
+        for chunk in range(0, len(records), INDEX_STRIDE):
+            part = records[chunk:chunk + INDEX_STRIDE]
+            columns = np.column_stack([part["timestamp"]]
+                                      + [scaled(part, field) for field in self.fields])
+            np.savetxt(csv_file, columns, fmt=formats, delimiter=delimiter)
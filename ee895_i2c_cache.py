@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Read-through cache for the measurement registers of the EE895 Sensor.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+"""
+
+import threading
+import time
+
+
+class _Flight():
+    """A read in progress, the callers asking for the same key wait on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.exception = None
+        self.generation = None
+
+
+class RegisterCache():
+    """Thread-safe read-through cache with a time to live.
+
+    Concurrent callers asking for the same key share one read: the first
+    one reads from the bus, the others wait for its result (single flight).
+    """
+
+    def __init__(self, ttl, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = {}
+        self._flights = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, read):
+        """cached value of key, read() fetches it when it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self.hits += 1
+                return list(entry[1])
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                flight.generation = self._generation
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.exception is not None:
+                raise flight.exception
+            return list(flight.value)
+        try:
+            flight.value = read()
+        except BaseException as exception:
+            flight.exception = exception
+            raise
+        else:
+            with self._lock:
+                # a value read before an invalidate() may already be outdated
+                if flight.generation == self._generation:
+                    self._entries[key] = (self.clock() + self.ttl, flight.value)
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return list(flight.value)
+
+    def invalidate(self, key=None):
+        """forget key, or everything without a key"""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """hits, misses and coalesced reads"""
+        with self._lock:
+            requests = self.hits + self.misses + self.coalesced
+            return {"hits": self.hits, "misses": self.misses,
+                    "coalesced": self.coalesced,
+                    "hit_rate": (requests - self.misses) / requests if requests else 0.0}
+
+
+def cache_sensor(sensor, ttl=None, clock=time.monotonic):
+    """give the sensor a RegisterCache and return it; without ttl the values
+    live for one measuring interval, the sensor does not refresh them faster"""
+    if ttl is None:
+        ttl = sensor.read_co2_measuring_interval() / 10
+    sensor.cache = RegisterCache(ttl, clock)
+    return sensor.cache
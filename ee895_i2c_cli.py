@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Command line tool for the EE895 Sensor via I2c interface.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+
+Usage: ee895 [--bus N] [--address A] [--format json|csv] [--simulate] command
+
+    info                     serial number, firmware, name and settings
+    read [quantity ...]      one reading, temperature, co2 and pressure by default
+    stream [--count N]       every new measurement of the continuous mode
+    config get [name ...]    settings, all by default
+    config set name=value    change settings, prints the written ones
+    bench [benchmark ...]    run the benchmarks against the simulator
+
+Only the library is imported at start, the simulator and the benchmarks
+(which need numpy) are imported when they are used.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+
+from ee895_i2c_library import (DEFAULT_I2C_ADDRESS, DEFAULT_I2C_BUS, EE895,
+                               REGISTER_MAP, SAMPLE_QUANTITIES, SETTINGS)
+
+
+class Output():
+    """Writes records (dicts with the same keys) as json lines or csv."""
+
+    def __init__(self, output_format, stream=sys.stdout):
+        self.output_format = output_format
+        self.stream = stream
+        self._writer = None
+
+    def write(self, record):
+        """write one record and flush, so pipes see it at once"""
+        if self.output_format == "json":
+            self.stream.write(json.dumps(record) + "\n")
+        else:
+            if self._writer is None:
+                self._writer = csv.DictWriter(self.stream, list(record))
+                self._writer.writeheader()
+            self._writer.writerow(record)
+        self.stream.flush()
+
+
+def open_sensor(arguments):
+    """the sensor given by the arguments"""
+    if arguments.simulate:
+        from ee895_i2c_simulator import EE895Simulator  # pylint: disable=import-outside-toplevel
+        return EE895(EE895Simulator(arguments.address), arguments.address)
+    return EE895(arguments.bus, arguments.address)
+
+
+def text(registers):
+    """register bytes of a name as text"""
+    return "".join("{:c}".format(x) for x in registers if x)
+
+
+def plain(value):
+    """floats of the sensor to the 7 digits of float32, 23.41 not 23.40999984741211"""
+    return float("%.7g" % value) if isinstance(value, float) else value
+
+
+def info(sensor, arguments, output):
+    """identity and settings"""
+    record = {"serial_number": "".join("{:02x}".format(x) for x in sensor.read_serial_number()),
+              "firmware_version": ".".join("{:01d}".format(x)
+                                           for x in sensor.read_firmware_version()),
+              "sensor_name": text(sensor.read_sensor_name())}
+    record.update(sensor.read_config())
+    output.write(record)
+
+
+def read(sensor, arguments, output):
+    """one reading of the quantities"""
+    unknown = set(arguments.quantities) - set(REGISTER_MAP)
+    if unknown:
+        raise ValueError("unknown quantities: " + ", ".join(sorted(unknown)))
+    readings = sensor.read_many(arguments.quantities or SAMPLE_QUANTITIES)
+    record = {"timestamp": round(time.time(), 3)}
+    record.update((name, plain(readings[name].value))
+                  for name in arguments.quantities or SAMPLE_QUANTITIES)
+    output.write(record)
+
+
+def stream(sensor, arguments, output):
+    """every new measurement of the continuous mode"""
+    for sample in sensor.stream(max_samples=arguments.count):
+        record = {"timestamp": round(time.time(), 3)}
+        record.update((name, plain(value)) for name, value in zip(SAMPLE_QUANTITIES, sample[1:]))
+        output.write(record)
+
+
+def config(sensor, arguments, output):
+    """get or set settings"""
+    if arguments.action == "get":
+        names = arguments.settings or SETTINGS
+        unknown = set(names) - set(SETTINGS)
+        if unknown:
+            raise ValueError("unknown settings: " + ", ".join(sorted(unknown)))
+        output.write({name: getattr(sensor, "read_" + name)() for name in names})
+        return
+    settings = {}
+    for setting in arguments.settings:
+        name, separator, value = setting.partition("=")
+        if not separator:
+            raise ValueError("settings are set as name=value, not " + setting)
+        settings[name] = int(value, 0)
+    written = sensor.apply_config(settings)
+    output.write({name: name in written for name in settings})
+
+
+def bench(sensor, arguments, output):  # pylint: disable=unused-argument
+    """run benchmarks"""
+    try:
+        import ee895_i2c_benchmark  # pylint: disable=import-outside-toplevel
+    except ImportError as exception:
+        if exception.name != "numpy":
+            raise
+        raise ImportError("%s, the benchmarks need numpy: pip install .[numpy]"
+                          % exception) from exception
+    unknown = set(arguments.benchmarks) - set(ee895_i2c_benchmark.BENCHMARKS)
+    if unknown:
+        raise ValueError("unknown benchmarks: " + ", ".join(sorted(unknown)))
+    ee895_i2c_benchmark.main(arguments.benchmarks)
+
+
+def parse_arguments(argv):
+    """command line arguments"""
+    parser = argparse.ArgumentParser(prog="ee895", description="EE895 CO2 sensor on i2c")
+    parser.add_argument("--bus", type=int, default=DEFAULT_I2C_BUS, help="i2c bus number")
+    parser.add_argument("--address", type=lambda value: int(value, 0),
+                        default=DEFAULT_I2C_ADDRESS, help="i2c address")
+    parser.add_argument("--format", choices=("json", "csv"), default="json",
+                        dest="output_format")
+    parser.add_argument("--simulate", action="store_true",
+                        help="use EE895Simulator instead of the i2c bus")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("info", help="serial number, firmware, name and settings")
+    parser_read = commands.add_parser("read", help="read quantities once")
+    parser_read.add_argument("quantities", nargs="*", metavar="quantity",
+                             help=", ".join(sorted(REGISTER_MAP)))
+    parser_stream = commands.add_parser("stream", help="every new measurement")
+    parser_stream.add_argument("--count", type=int, default=None)
+    parser_config = commands.add_parser("config", help="get or set settings")
+    parser_config.add_argument("action", choices=("get", "set"))
+    parser_config.add_argument("settings", nargs="*")
+    parser_bench = commands.add_parser("bench", help="run benchmarks")
+    parser_bench.add_argument("benchmarks", nargs="*")
+    return parser.parse_args(argv)
+
+
+COMMANDS = {"info": info, "read": read, "stream": stream, "config": config,
+            "bench": bench}
+
+
+def main(argv=None):
+    """run the command line tool, returns the exit status"""
+    arguments = parse_arguments(argv)
+    output = Output(arguments.output_format)
+    try:
+        with open_sensor(arguments) as sensor:
+            COMMANDS[arguments.command](sensor, arguments, output)
+    except KeyboardInterrupt:
+        pass
+    except (ImportError, OSError, Warning, ValueError) as exception:
+        sys.stderr.write("ee895: %s\n" % exception)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+Collector process owning the EE895 Sensors, serving their samples to local
+clients over a Unix domain socket.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+
+Protocol: every message is a header (opcode, status, payload length) and the
+payload. Samples are RECORD structs. A SUBSCRIBE request turns the connection
+into a push-only stream of PUSH messages.
+
+Usage: python3 ee895_i2c_collector.py [socket path]
+"""
+
+import itertools
+import os
+import queue
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+
+from ee895_i2c_library import EE895, EE895Error, MEASUREMENT_QUANTITIES
+
+DEFAULT_SOCKET_PATH = "/tmp/ee895_collector.sock"
+HEADER = struct.Struct("<BBI")
+COLLECTED_QUANTITIES = MEASUREMENT_QUANTITIES
+# sensor index, sequence number, unix time, status_details, measurements
+RECORD = struct.Struct("<BIdH%df" % len(COLLECTED_QUANTITIES))
+OPCODE_LIST = 0x01
+OPCODE_LATEST = 0x02
+OPCODE_HISTORY = 0x03
+OPCODE_SUBSCRIBE = 0x04
+OPCODE_PUSH = 0x05
+STATUS_OK = 0x00
+STATUS_NO_DATA = 0x01
+STATUS_UNKNOWN_SENSOR = 0x02
+STATUS_BAD_REQUEST = 0x03
+ALL_SENSORS = 0xFF
+# pushes queued for a slow subscriber before the oldest are dropped
+SUBSCRIBER_QUEUE = 256
+
+CollectedSample = namedtuple("CollectedSample", ("sensor", "sequence", "timestamp",
+                                                 "status_details")
+                             + COLLECTED_QUANTITIES)
+
+
+def get_collector_status_string(status_code):
+    """Return string from status_code of a collector response."""
+    status_string = {
+        STATUS_OK: "Success",
+        STATUS_NO_DATA: "no sample collected yet",
+        STATUS_UNKNOWN_SENSOR: "unknown sensor",
+        STATUS_BAD_REQUEST: "bad request",
+    }
+    return status_string.get(status_code, "Unknown error")
+
+
+def send_message(connection, opcode, payload=b"", status=STATUS_OK):
+    """send one message"""
+    connection.sendall(HEADER.pack(opcode, status, len(payload)) + payload)
+
+
+def receive_exactly(connection, size):
+    """receive size bytes, raises ConnectionError when the peer is gone"""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        count = connection.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("connection closed")
+        received += count
+    return bytes(buf)
+
+
+def receive_message(connection):
+    """receive one message, returns (opcode, status, payload)"""
+    opcode, status, length = HEADER.unpack(receive_exactly(connection, HEADER.size))
+    return opcode, status, receive_exactly(connection, length)
+
+
+def unpack_samples(payload):
+    """CollectedSample list of a payload of RECORD structs"""
+    return [CollectedSample(*record) for record in RECORD.iter_unpack(payload)]
+
+
+def offer(pushes, item):
+    """queue item, dropping the oldest pushes of a slow subscriber"""
+    while True:
+        try:
+            pushes.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                pushes.get_nowait()
+            except queue.Empty:
+                pass
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """Answers the requests of one client connection."""
+
+    def handle(self):
+        collector = self.server.collector
+        while True:
+            try:
+                opcode, _, payload = receive_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            if opcode == OPCODE_SUBSCRIBE:
+                collector.push(self.request, payload)
+                return
+            status, response = collector.answer(opcode, payload)
+            try:
+                send_message(self.request, opcode, response, status)
+            except OSError:
+                return
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Collector():
+    """Samples the sensors on a fixed schedule and serves the latest and
+    historical samples over a Unix domain socket."""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, interval=15.0, history=5760):
+        self.socket_path = socket_path
+        self.interval = interval
+        self.history = history
+        self.sensors = []
+        self.errors = []
+        self._samples = []
+        self._sequence = 0
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def add(self, sensor, name=None):
+        """add a sensor, returns its index for the clients"""
+        if len(self.sensors) >= ALL_SENSORS:
+            raise ValueError("too many sensors")
+        with self._lock:
+            self.sensors.append((name or "0x%02x" % sensor.i2c_address, sensor))
+            self.errors.append(0)
+            self._samples.append(deque(maxlen=self.history))
+        return len(self.sensors) - 1
+
+    def start(self):
+        """start serving and sampling in background threads"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._stop.clear()
+        self._server = _Server(self.socket_path, _RequestHandler)
+        self._server.collector = self
+        self._threads = [threading.Thread(target=self._server.serve_forever, daemon=True),
+                         threading.Thread(target=self._sample_loop, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """stop sampling and serving"""
+        self._stop.set()
+        self._server.shutdown()
+        self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for pushes in subscribers:
+            offer(pushes, None)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def sample(self):
+        """read every sensor once and publish the samples"""
+        for index, (_, sensor) in enumerate(self.sensors):
+            try:
+                readings = sensor.read_many(COLLECTED_QUANTITIES + ("status_details",))
+            except (OSError, Warning):
+                self.errors[index] += 1
+                continue
+            with self._lock:
+                self._sequence += 1
+                record = RECORD.pack(index, self._sequence, time.time(),
+                                     readings["status_details"].value,
+                                     *(readings[name].value for name in COLLECTED_QUANTITIES))
+                self._samples[index].append(record)
+                subscribers = list(self._subscribers.items())
+            for (_, wanted), pushes in subscribers:
+                if wanted in (ALL_SENSORS, index):
+                    offer(pushes, record)
+
+    def _sample_loop(self):
+        """sample on absolute deadlines, skipping the ones already missed"""
+        deadline = time.monotonic()
+        while not self._stop.is_set():
+            self.sample()
+            deadline += self.interval
+            now = time.monotonic()
+            while deadline <= now:
+                deadline += self.interval
+            self._stop.wait(deadline - now)
+
+    def answer(self, opcode, payload):
+        """answer a request, returns (status, payload)"""
+        if opcode == OPCODE_LIST:
+            return STATUS_OK, "\n".join(name for name, _ in self.sensors).encode()
+        if opcode not in (OPCODE_LATEST, OPCODE_HISTORY) or len(payload) < 1:
+            return STATUS_BAD_REQUEST, b""
+        index = payload[0]
+        if index >= len(self.sensors):
+            return STATUS_UNKNOWN_SENSOR, b""
+        with self._lock:
+            samples = self._samples[index]
+            if not samples:
+                return STATUS_NO_DATA, b""
+            if opcode == OPCODE_LATEST:
+                return STATUS_OK, samples[-1]
+            if len(payload) < 5:
+                return STATUS_BAD_REQUEST, b""
+            count = struct.unpack_from("<I", payload, 1)[0]
+            # the newest count samples, none for 0
+            return STATUS_OK, b"".join(itertools.islice(
+                samples, len(samples) - min(count, len(samples)), None))
+
+    def push(self, connection, payload):
+        """send every new sample of the wanted sensor until the client leaves"""
+        wanted = payload[0] if payload else ALL_SENSORS
+        pushes = queue.Queue(SUBSCRIBER_QUEUE)
+        key = (id(pushes), wanted)
+        with self._lock:
+            self._subscribers[key] = pushes
+        try:
+            while True:
+                record = pushes.get()
+                if record is None:
+                    return
+                send_message(connection, OPCODE_PUSH, record)
+        except OSError:
+            return
+        finally:
+            with self._lock:
+                del self._subscribers[key]
+
+
+class CollectorClient():
+    """Reads the samples of one sensor of a Collector.
+
+    The getters match EE895, so CollectorClient() can replace EE895() in
+    scripts that only read measurements.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, sensor=0):
+        self.socket_path = socket_path
+        self.sensor = sensor
+        self._connection = None
+        self._last_sequence = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """close the connection to the collector"""
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            connection.close()
+
+    def _connect(self):
+        """new connection to the collector"""
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(self.socket_path)
+        return connection
+
+    def _request(self, opcode, payload=b""):
+        """send a request and return the payload of the answer"""
+        if self._connection is None:
+            self._connection = self._connect()
+        try:
+            send_message(self._connection, opcode, payload)
+            _, status, response = receive_message(self._connection)
+        except OSError:
+            self.close()
+            raise
+        if status != STATUS_OK:
+            raise EE895Error(get_collector_status_string(status))
+        return response
+
+    def sensors(self):
+        """names of the sensors of the collector"""
+        return self._request(OPCODE_LIST).decode().split("\n")
+
+    def latest(self):
+        """the latest CollectedSample"""
+        sample = unpack_samples(self._request(OPCODE_LATEST, bytes([self.sensor])))[0]
+        self._last_sequence = sample.sequence
+        return sample
+
+    def history(self, count):
+        """the last count CollectedSample, oldest first"""
+        return unpack_samples(self._request(OPCODE_HISTORY,
+                                            struct.pack("<BI", self.sensor, count)))
+
+    def subscribe(self):
+        """yield every new CollectedSample as soon as the collector has it"""
+        connection = self._connect()
+        try:
+            send_message(connection, OPCODE_SUBSCRIBE, bytes([self.sensor]))
+            while True:
+                _, _, payload = receive_message(connection)
+                yield unpack_samples(payload)[0]
+        finally:
+            connection.close()
+
+    def get_all_measurements(self):
+        """get temperature, co2 and pressure like the simplified protocol"""
+        sample = self.latest()
+        return sample.temperature_c, sample.co2_average_pc, sample.pressure_mbar
+
+    def get_temp_c(self):
+        """get the temperature in celsius"""
+        return self.latest().temperature_c
+
+    def get_temp_f(self):
+        """get the temperature in fahrenheit"""
+        return self.latest().temperature_f
+
+    def get_temp_k(self):
+        """get the temperature in Kelvin"""
+        return self.latest().temperature_k
+
+    def get_co2_aver_with_pc(self):
+        """get the co2 value in average mode with pressure compenstaion"""
+        return self.latest().co2_average_pc
+
+    def get_co2_raw_with_pc(self):
+        """get the co2 value raw with pressure compenstaion"""
+        return self.latest().co2_raw_pc
+
+    def get_co2_aver_with_npc(self):
+        """get the co2 value in average mode with no pressure compenstaion"""
+        return self.latest().co2_average_npc
+
+    def get_co2_raw_with_npc(self):
+        """get the co2 value raw with no pressure compenstaion"""
+        return self.latest().co2_raw_npc
+
+    def get_pressure_mbar(self):
+        """get the pressure value in mbar"""
+        return self.latest().pressure_mbar
+
+    def get_pressure_psi(self):
+        """get the pressure value in psi"""
+        return self.latest().pressure_psi
+
+    def status_details(self):
+        """status_details of the latest sample"""
+        return self.latest().status_details
+
+    def data_ready(self):
+        """1 if the collector has a sample this client has not read yet"""
+        last_sequence = self._last_sequence
+        return int(self.latest().sequence != last_sequence)
+
+
+def main(socket_path):
+    """collect the sensor on i2c bus 1 until interrupted"""
+    sensor = EE895()
+    collector = Collector(socket_path, sensor.read_co2_measuring_interval() / 10)
+    collector.add(sensor, "".join("{:c}".format(x) for x in sensor.read_sensor_name()
+                                  if x))
+    with collector:
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOCKET_PATH)
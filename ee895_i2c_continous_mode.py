@@ -20,10 +20,14 @@ publications, such as catalogues, the content of the other documentation takes p
 We assume no liability for the information contained in this document.
 """
 
+import sys
 import time
 from ee895_i2c_library import EE895
 
 CSV_DELIMETER = ","
+# with a file name as argument the samples go to a binary log instead of the
+# screen, read it with ee895_i2c_binlog.BinaryLogReader or export it to csv
+LOG_PATH = sys.argv[1] if len(sys.argv) > 1 else None
 
 EE_895 = EE895()
 
@@ -56,16 +60,24 @@ print("temperarture",CSV_DELIMETER,"CO2",CSV_DELIMETER,"pressure")
 time.sleep(1)
 
 
-for i in range(30):
+# stream follows the measuring interval of the sensor and reads new data only
+if LOG_PATH is not None:
+    from ee895_i2c_binlog import BinaryLogWriter
+    LOG = BinaryLogWriter.for_sensor(LOG_PATH, EE_895)
+samples = 0
+while samples < 30:
     try:
-        temperature = EE_895.get_temp_c()
-        co2 = EE_895.get_co2_aver_with_pc()
-        pressure = EE_895.get_pressure_mbar()
-        print('%0.2f °C' % temperature, CSV_DELIMETER, end="")
-        print('%0.0f ppm' % co2, CSV_DELIMETER, end="")
-        print('%0.1f mbar' % pressure)
+        for sample in EE_895.stream(max_samples=30 - samples):
+            samples += 1
+            if LOG_PATH is not None:
+                LOG.write_sample(sample)
+                continue
+            print('%0.2f °C' % sample.temperature, CSV_DELIMETER, end="")
+            print('%0.0f ppm' % sample.co2, CSV_DELIMETER, end="")
+            print('%0.1f mbar' % sample.pressure)
     except Warning as exception:
         print("Exception: " + str(exception))
-
-    finally:
+        # wait one measuring interval (15 s) before the sensor is asked again
         time.sleep(15)
+if LOG_PATH is not None:
+    LOG.close()
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Callbacks on status, threshold and rate of change events of EE895 Sensors.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+"""
+
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+from ee895_i2c_library import SAMPLE_QUANTITIES
+
+# names of the bits of status_details
+STATUS_BITS = {0: "co2_too_high", 1: "co2_too_low", 2: "temperature_too_high",
+               3: "temperature_too_low", 6: "pressure_too_high", 7: "pressure_too_low"}
+# data_ready polls per measuring interval while waiting for a measurement
+EVENT_POLLS_PER_INTERVAL = 20
+# a rate alarm ends when the rate falls below this part of its limit
+RATE_RESET = 0.8
+# events waiting for the dispatcher, more are dropped
+EVENT_QUEUE_SIZE = 1000
+
+# kind is "status", "threshold" or "rate"; value and previous are the
+# status_details word, the reading or the rate per minute; readings holds
+# the values read with the measurement, None when none were needed
+Event = namedtuple("Event", ["kind", "quantity", "timestamp", "active", "value",
+                             "previous", "readings"])
+
+
+def status_names(status):
+    """names of the bits set in a status_details word"""
+    return [name for bit, name in STATUS_BITS.items() if status & 1 << bit]
+
+
+class Threshold():
+    """A level of a quantity with hysteresis: active once a reading reaches
+    level, inactive again below level - hysteresis. falling turns it
+    around, for limits a quantity must not drop under."""
+
+    def __init__(self, quantity, level, callback, hysteresis=0.0, falling=False):
+        self.quantity = quantity
+        self.level = level
+        self.callback = callback
+        self.hysteresis = hysteresis
+        self.falling = falling
+        self.active = False
+        self.last = None
+
+    def update(self, timestamp, value):
+        """new reading, returns an Event when the state changed"""
+        previous = self.last
+        self.last = value
+        if self.falling:
+            crossed = value <= self.level if not self.active else value > self.level + self.hysteresis
+        else:
+            crossed = value >= self.level if not self.active else value < self.level - self.hysteresis
+        if not crossed:
+            return None
+        self.active = not self.active
+        return Event("threshold", self.quantity, timestamp, self.active, value, previous, None)
+
+
+class RateAlarm():
+    """Change of a quantity per minute over the last window seconds: the
+    alarm is active while it exceeds limit in either direction and ends
+    below RATE_RESET * limit. No rate is given before half of the window
+    is covered."""
+
+    def __init__(self, quantity, limit, callback, window=300.0):
+        self.quantity = quantity
+        self.limit = limit
+        self.callback = callback
+        self.window = window
+        self.active = False
+        self.rate = None
+        self.history = deque()
+
+    def update(self, timestamp, value):
+        """new reading, returns an Event when the alarm started or ended"""
+        history = self.history
+        history.append((timestamp, value))
+        while timestamp - history[0][0] > self.window:
+            history.popleft()
+        first_timestamp, first_value = history[0]
+        if timestamp - first_timestamp < self.window / 2:
+            return None
+        previous = self.rate
+        self.rate = (value - first_value) / (timestamp - first_timestamp) * 60.0
+        if abs(self.rate) >= (self.limit * RATE_RESET if self.active else self.limit):
+            if self.active:
+                return None
+        elif not self.active:
+            return None
+        self.active = not self.active
+        return Event("rate", self.quantity, timestamp, self.active, self.rate, previous, None)
+
+
+class EventEngine():
+    """Watches an EE895 in continuous mode and calls back on events.
+
+    The measuring interval is read when run() starts and the bus is only
+    used as often as the sensor measures:
+
+    - with thresholds or rate alarms, data_ready is polled from when the
+      next measurement is due, EVENT_POLLS_PER_INTERVAL times per
+      interval, and only their quantities are read; a measurement found
+      on the first poll moves the next first poll one step earlier, so
+      the polls stay locked to the measurements of the sensor
+    - status_details is read once per measurement if there are status
+      callbacks, the status_quantities are only read when it changed
+
+    Callbacks run on a dispatcher thread, a slow callback does not delay
+    the polls; events beyond EVENT_QUEUE_SIZE waiting ones are dropped.
+    Errors of the bus (OSError and Warning) are counted in stats and the
+    polls go on, as are exceptions of callbacks.
+    """
+
+    def __init__(self, sensor, status_quantities=SAMPLE_QUANTITIES,
+                 polls_per_interval=EVENT_POLLS_PER_INTERVAL, clock=time.monotonic,
+                 sleep=None):
+        self.sensor = sensor
+        self.status_quantities = status_quantities
+        self.polls_per_interval = polls_per_interval
+        self.clock = clock
+        self._stopped = threading.Event()
+        self.sleep = sleep or self._stopped.wait
+        self.interval = None
+        self.status = None
+        self.last_error = None
+        self.status_handlers = []
+        self.thresholds = []
+        self.rate_alarms = []
+        self.stats = {"polls": 0, "measurements": 0, "events": 0, "dropped_events": 0,
+                      "errors": 0, "callback_errors": 0}
+        self._queue = queue.Queue(EVENT_QUEUE_SIZE)
+        self._dispatcher = None
+        self._sampler = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def on_status(self, callback, mask=0xFF):
+        """call callback(event) when a bit of status_details in mask changes"""
+        self.status_handlers.append((callback, mask))
+
+    def on_threshold(self, quantity, level, callback, hysteresis=0.0, falling=False):
+        """call callback(event) when quantity crosses level, see Threshold"""
+        threshold = Threshold(quantity, level, callback, hysteresis, falling)
+        self.thresholds.append(threshold)
+        return threshold
+
+    def on_rate(self, quantity, limit, callback, window=300.0):
+        """call callback(event) when quantity changes faster than limit per
+        minute, see RateAlarm"""
+        alarm = RateAlarm(quantity, limit, callback, window)
+        self.rate_alarms.append(alarm)
+        return alarm
+
+    def quantities(self):
+        """quantities read with every measurement"""
+        quantities = []
+        for watcher in self.thresholds + self.rate_alarms:
+            if watcher.quantity not in quantities:
+                quantities.append(watcher.quantity)
+        return tuple(quantities)
+
+    def start(self):
+        """run() on a sampling thread until stop()"""
+        self._sampler = threading.Thread(target=self.run, name="ee895 events", daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        """end run(), wait for the callbacks of the events so far and stop
+        the dispatcher"""
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        if self._dispatcher is not None:
+            self._queue.put(None)
+            self._dispatcher.join()
+            self._dispatcher = None
+
+    def wait(self):
+        """wait until the callbacks of all events so far returned"""
+        self._queue.join()
+
+    def run(self, duration=None, measurements=None):
+        """watch the sensor for duration seconds or measurements, until
+        stop() without both"""
+        if not (self.status_handlers or self.thresholds or self.rate_alarms):
+            raise ValueError("no callbacks to watch for")
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch,
+                                                name="ee895 dispatcher", daemon=True)
+            self._dispatcher.start()
+        self._stopped.clear()
+        self.interval = self.sensor.read_co2_measuring_interval() / 10
+        step = self.interval / self.polls_per_interval
+        quantities = self.quantities()
+        start = deadline = self.clock()
+        first_poll = True
+        count = 0
+        while not self._stopped.is_set() and (measurements is None or count < measurements):
+            if duration is not None and deadline >= start + duration:
+                self.sleep(start + duration - self.clock())
+                return
+            delay = deadline - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+            readings = None
+            try:
+                if quantities:
+                    self.stats["polls"] += 1
+                    if not self.sensor.data_ready():
+                        deadline += step
+                        first_poll = False
+                        continue
+                    readings = self.sensor.read_many(quantities)
+                status = self.sensor.status_details() if self.status_handlers else None
+                self._evaluate(readings, status)
+            except (OSError, Warning) as exception:
+                self.stats["errors"] += 1
+                self.last_error = exception
+                deadline += step
+                continue
+            count += 1
+            self.stats["measurements"] += 1
+            deadline += self.interval - step if first_poll and quantities else self.interval
+            first_poll = True
+            now = self.clock()
+            if now - deadline >= self.interval:
+                deadline += (now - deadline) // self.interval * self.interval
+
+    def _evaluate(self, readings, status):
+        """turn a measurement into events; the bus is read before any state
+        changes, so a failing read leaves the events for the next poll"""
+        changed = 0
+        if status is not None:
+            previous = self.status
+            changed = status if previous is None else status ^ previous
+            if (readings is None and self.status_quantities
+                    and any(changed & mask for _, mask in self.status_handlers)):
+                readings = self.sensor.read_many(self.status_quantities)
+        now = self.clock()
+        events = []
+        for watcher in self.thresholds + self.rate_alarms:
+            event = watcher.update(now, readings[watcher.quantity].value)
+            if event is not None:
+                events.append((watcher.callback, event._replace(readings=readings)))
+        if status is not None:
+            self.status = status
+            for callback, mask in self.status_handlers:
+                if changed & mask:
+                    events.append((callback, Event("status", "status_details", now,
+                                                   bool(status & mask), status, previous,
+                                                   readings)))
+        for callback, event in events:
+            self.stats["events"] += 1
+            try:
+                self._queue.put_nowait((callback, event))
+            except queue.Full:
+                self.stats["dropped_events"] += 1
+
+    def _dispatch(self):
+        """call the callbacks of the queued events until stop()"""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                callback, event = item
+                try:
+                    callback(event)
+                except Exception:  # pylint: disable=broad-except
+                    self.stats["callback_errors"] += 1
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Sampling over the simplified protocol with escalation to the register protocol.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+"""
+
+import time
+from collections import namedtuple
+
+from ee895_i2c_library import (CO2_RANGE, PRESSURE_RANGE, SAMPLE_QUANTITIES,
+                               TEMPERATURE_RANGE, plan_reads)
+
+# quantities read over the register protocol, in the order of a sample
+REGISTER_QUANTITIES = SAMPLE_QUANTITIES + ("status_details",)
+PLAUSIBLE_RANGES = (TEMPERATURE_RANGE, CO2_RANGE, PRESSURE_RANGE)
+# largest believable change between two samples of temperature, co2, pressure
+DEFAULT_MAX_STEPS = (5.0, 2000.0, 5.0)
+# largest difference between the paths in a cross-check, the simplified
+# protocol has a resolution of 0.01 °C, 1 ppm and 0.1 mbar
+DEFAULT_TOLERANCES = (0.011, 1.0, 0.11)
+PATHS = ("simplified", "status", "register")
+
+# path is "simplified" or "register", reason why the register protocol was
+# used: None, "hold", "cross_check", "error", "range", "step" or "status"
+FastPathSample = namedtuple("FastPathSample", ["timestamp", "temperature", "co2",
+                                               "pressure", "path", "reason"])
+
+
+def path_cost(path):
+    """(transactions, bytes written, bytes read) of a path without retries"""
+    if path == "simplified":
+        return 1, 1, 8
+    plan = plan_reads(REGISTER_QUANTITIES if path == "register" else ("status_details",))
+    return (len(plan), 7 * len(plan),
+            sum(4 + 2 * count for _, count, _ in plan))
+
+
+class FastPathSampler():
+    """Samples an EE895 with the 8 byte frame of the simplified protocol,
+    which has no crc, and uses the register protocol instead:
+
+    - every cross_check_interval samples, comparing both paths
+    - when a value is outside the range of the sensor or changed by more
+      than max_steps since the last sample
+    - when the status_details read every status_interval samples flags a
+      measurement out of range
+    - when the simplified read fails
+
+    After any of these but the cross-check with matching values, the next
+    hold samples come from the register protocol too. Intervals of 0 turn
+    the cross-check or the status read off. stats counts samples, the
+    transactions and bytes they cost and the time spent on every path.
+    """
+
+    def __init__(self, sensor, cross_check_interval=100, status_interval=10, hold=10,
+                 max_steps=DEFAULT_MAX_STEPS, tolerances=DEFAULT_TOLERANCES,
+                 clock=time.monotonic):
+        self.sensor = sensor
+        self.cross_check_interval = cross_check_interval
+        self.status_interval = status_interval
+        self.hold = hold
+        self.max_steps = max_steps
+        self.tolerances = tolerances
+        self.clock = clock
+        self.last = None
+        self._costs = {path: path_cost(path) for path in PATHS}
+        self._count = 0
+        self._hold = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """forget the statistics"""
+        self.stats = {path: {"reads": 0, "transactions": 0, "bytes": 0, "seconds": 0.0}
+                      for path in PATHS}
+        self.stats["reasons"] = {}
+        self.stats["mismatches"] = 0
+
+    def sample(self):
+        """take one FastPathSample"""
+        self._count += 1
+        values = None
+        reason = None
+        if self._hold:
+            self._hold -= 1
+            reason = "hold"
+        else:
+            if self.cross_check_interval and self._count % self.cross_check_interval == 0:
+                reason = "cross_check"
+            try:
+                values = self._timed("simplified", self.sensor.get_all_measurements)
+            except (OSError, Warning):
+                reason = "error"
+            if reason is None:
+                reason = self._implausible(values)
+            if (reason is None and self.status_interval
+                    and self._count % self.status_interval == 0):
+                try:
+                    if self._timed("status", self.sensor.status_details):
+                        reason = "status"
+                except (OSError, Warning):
+                    reason = "error"
+            if reason is None:
+                return self._accept(values, "simplified", None)
+        readings = self._timed("register", self.sensor.read_many, REGISTER_QUANTITIES)
+        verified = tuple(readings[name].value for name in SAMPLE_QUANTITIES)
+        if readings["status_details"].value:
+            self._hold = self.hold
+        if reason == "cross_check" and not all(
+                abs(simplified - register) <= tolerance for simplified, register, tolerance
+                in zip(values, verified, self.tolerances)):
+            self.stats["mismatches"] += 1
+            self._hold = self.hold
+        elif reason not in ("hold", "cross_check"):
+            self._hold = self.hold
+        self.stats["reasons"][reason] = self.stats["reasons"].get(reason, 0) + 1
+        return self._accept(verified, "register", reason)
+
+    def _accept(self, values, path, reason):
+        """remember values as the last sample and return it"""
+        self.last = values
+        return FastPathSample(self.clock(), *values, path, reason)
+
+    def _implausible(self, values):
+        """"range" or "step" if values are not believable, else None"""
+        for value, (low, high) in zip(values, PLAUSIBLE_RANGES):
+            if not low <= value <= high:
+                return "range"
+        if self.last is not None:
+            for value, last, max_step in zip(values, self.last, self.max_steps):
+                if abs(value - last) > max_step:
+                    return "step"
+        return None
+
+    def _timed(self, path, function, *args):
+        """call function and book its cost on path"""
+        stats = self.stats[path]
+        transactions, bytes_written, bytes_read = self._costs[path]
+        start = self.clock()
+        try:
+            return function(*args)
+        finally:
+            stats["reads"] += 1
+            stats["transactions"] += transactions
+            stats["bytes"] += bytes_written + bytes_read
+            stats["seconds"] += self.clock() - start
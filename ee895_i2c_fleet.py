@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Polling of many EE895 Sensors on several I2c buses.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from ee895_i2c_library import SAMPLE_QUANTITIES
+
+Snapshot = namedtuple("Snapshot", ["timestamp", "readings", "errors", "duration"])
+
+
+class SensorFleet():
+    """Polls many EE895 keyed by (bus, address).
+
+    Transactions on one bus are serialised with a lock per bus, the buses
+    are swept in parallel on a thread pool. A failing sensor ends up in the
+    errors of the snapshot and does not stop the others.
+    """
+
+    def __init__(self, quantities=SAMPLE_QUANTITIES, max_workers=None):
+        self.quantities = quantities
+        self._buses = {}
+        self._locks = {}
+        self._executor = ThreadPoolExecutor(max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """stop the worker threads, the sensors are not closed"""
+        self._executor.shutdown()
+
+    def add(self, sensor, bus=None, select=None, key=None):
+        """register a sensor and return its key.
+
+        bus names the physical i2c bus, by default the bus number of the
+        transport. select is called under the bus lock before every access,
+        e.g. to switch a multiplexer channel; then pass a key like
+        ((bus, channel), address) to tell sensors with the same address apart.
+        """
+        if bus is None:
+            bus = getattr(sensor.bus, "bus_number", id(sensor.bus))
+        if key is None:
+            key = (bus, sensor.i2c_address)
+        if key in self:
+            raise ValueError("sensor %r is already registered" % (key,))
+        self._buses.setdefault(bus, []).append((key, sensor, select))
+        self._locks.setdefault(bus, threading.Lock())
+        return key
+
+    def remove(self, key):
+        """unregister the sensor with key"""
+        for bus, sensors in self._buses.items():
+            for entry in sensors:
+                if entry[0] == key:
+                    sensors.remove(entry)
+                    if not sensors:
+                        del self._buses[bus]
+                    return
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return any(entry[0] == key for sensors in self._buses.values()
+                   for entry in sensors)
+
+    def __len__(self):
+        return sum(len(sensors) for sensors in self._buses.values())
+
+    def lock(self, bus):
+        """lock of a bus, hold it to use the bus besides the fleet"""
+        return self._locks[bus]
+
+    def sweep(self):
+        """read every sensor once, returns a Snapshot with a dict of
+        key => readings and a dict of key => exception"""
+        timestamp = time.time()
+        start = time.monotonic()
+        futures = [self._executor.submit(self._sweep_bus, bus, list(sensors))
+                   for bus, sensors in self._buses.items()]
+        readings = {}
+        errors = {}
+        for future in futures:
+            bus_readings, bus_errors = future.result()
+            readings.update(bus_readings)
+            errors.update(bus_errors)
+        return Snapshot(timestamp, readings, errors, time.monotonic() - start)
+
+    def _sweep_bus(self, bus, sensors):
+        """read the sensors of one bus one after the other"""
+        readings = {}
+        errors = {}
+        lock = self._locks[bus]
+        for key, sensor, select in sensors:
+            try:
+                with lock:
+                    if select is not None:
+                        select()
+                    readings[key] = sensor.read_many(self.quantities)
+            except (OSError, Warning) as exception:
+                errors[key] = exception
+        return readings, errors
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Transaction statistics for the EE895 Sensor via I2c interface.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+"""
+
+import bisect
+import json
+import os
+import threading
+from collections import namedtuple
+
+from ee895_i2c_library import (FUNCTION_CODE_READ_REGISTER,
+                               FUNCTION_CODE_WRITE_REGISTER)
+
+# upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.5,
+                   float("inf"))
+FUNCTION_NAMES = {
+    FUNCTION_CODE_READ_REGISTER: "read",
+    FUNCTION_CODE_WRITE_REGISTER: "write",
+    None: "simplified",
+}
+
+# error is None, "nack", "crc" or "write_echo", crc and write echo errors
+# follow the transaction they belong to as an event with latency 0
+Event = namedtuple("Event", ["function_code", "register_address", "latency",
+                             "bytes_written", "bytes_read", "error"])
+
+
+class TransactionStats():
+    """Counts transactions, latencies, bytes and errors of EE895 sensors.
+
+    Pass it as instrumentation to EE895, several sensors can share one.
+    Hooks are called with every Event, e.g. to feed another metrics system.
+    """
+
+    def __init__(self, labels=None, buckets=LATENCY_BUCKETS):
+        self.labels = dict(labels or {})
+        self.buckets = tuple(buckets)
+        self.hooks = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """forget all statistics"""
+        with self._lock:
+            self.transactions = {}
+            self.histograms = {}
+            self.latency_sums = {}
+            self.errors = {}
+            self.bytes_written = 0
+            self.bytes_read = 0
+
+    def add_hook(self, hook):
+        """call hook(event) for every transaction and error"""
+        self.hooks.append(hook)
+
+    def transaction(self, function_code, register_address, latency,
+                    bytes_written, bytes_read, error=None):
+        """record a transaction, called by EE895"""
+        key = (function_code, register_address)
+        bucket = bisect.bisect_left(self.buckets, latency)
+        with self._lock:
+            self.transactions[key] = self.transactions.get(key, 0) + 1
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * len(self.buckets)
+            histogram[bucket] += 1
+            self.latency_sums[key] = self.latency_sums.get(key, 0.0) + latency
+            self.bytes_written += bytes_written
+            self.bytes_read += bytes_read
+            if error is not None:
+                self._count_error(key, error)
+        self._call_hooks(Event(function_code, register_address, latency,
+                               bytes_written, bytes_read, error))
+
+    def error(self, function_code, register_address, error):
+        """record a crc or write echo error, called by EE895"""
+        with self._lock:
+            self._count_error((function_code, register_address), error)
+        self._call_hooks(Event(function_code, register_address, 0.0, 0, 0, error))
+
+    def _count_error(self, key, error):
+        """count an error, the lock is held"""
+        error_key = key + (error,)
+        self.errors[error_key] = self.errors.get(error_key, 0) + 1
+
+    def _call_hooks(self, event):
+        """pass the event to the hooks"""
+        for hook in self.hooks:
+            hook(event)
+
+    def to_dict(self):
+        """statistics as plain data"""
+        with self._lock:
+            transactions = [
+                {"function": FUNCTION_NAMES.get(function_code, function_code),
+                 "register": register_address,
+                 "count": count,
+                 "latency_sum": self.latency_sums[(function_code, register_address)],
+                 "histogram": list(self.histograms[(function_code, register_address)])}
+                for (function_code, register_address), count in sorted(
+                    self.transactions.items(), key=str)]
+            errors = [
+                {"function": FUNCTION_NAMES.get(function_code, function_code),
+                 "register": register_address, "error": error, "count": count}
+                for (function_code, register_address, error), count in sorted(
+                    self.errors.items(), key=str)]
+            return {"labels": self.labels,
+                    "buckets": [str(bucket) for bucket in self.buckets],
+                    "transactions": transactions,
+                    "errors": errors,
+                    "bytes_written": self.bytes_written,
+                    "bytes_read": self.bytes_read}
+
+    def to_json(self):
+        """statistics as json text"""
+        return json.dumps(self.to_dict(), indent=1)
+
+    def to_prometheus(self):
+        """statistics in the Prometheus text format"""
+        stats = self.to_dict()
+        lines = [
+            "# HELP ee895_transactions_total EE895 i2c transactions.",
+            "# TYPE ee895_transactions_total counter",
+        ]
+        for entry in stats["transactions"]:
+            lines.append("ee895_transactions_total%s %d"
+                         % (self._labels(entry), entry["count"]))
+        lines += [
+            "# HELP ee895_transaction_seconds Duration of EE895 i2c transactions.",
+            "# TYPE ee895_transaction_seconds histogram",
+        ]
+        for entry in stats["transactions"]:
+            cumulative = 0
+            for bucket, count in zip(stats["buckets"], entry["histogram"]):
+                cumulative += count
+                le = "+Inf" if bucket == "inf" else bucket
+                lines.append("ee895_transaction_seconds_bucket%s %d"
+                             % (self._labels(entry, le=le), cumulative))
+            lines.append("ee895_transaction_seconds_sum%s %r"
+                         % (self._labels(entry), entry["latency_sum"]))
+            lines.append("ee895_transaction_seconds_count%s %d"
+                         % (self._labels(entry), entry["count"]))
+        lines += [
+            "# HELP ee895_errors_total EE895 NACK, crc and write echo errors.",
+            "# TYPE ee895_errors_total counter",
+        ]
+        for entry in stats["errors"]:
+            lines.append("ee895_errors_total%s %d"
+                         % (self._labels(entry, error=entry["error"]), entry["count"]))
+        lines += [
+            "# HELP ee895_bytes_total Bytes moved over the i2c bus.",
+            "# TYPE ee895_bytes_total counter",
+            "ee895_bytes_total%s %d" % (self._labels(None, direction="written"),
+                                        stats["bytes_written"]),
+            "ee895_bytes_total%s %d" % (self._labels(None, direction="read"),
+                                        stats["bytes_read"]),
+        ]
+        return "\n".join(lines) + "\n"
+
+    def _labels(self, entry, **extra):
+        """Prometheus label set of an entry"""
+        labels = dict(self.labels)
+        if entry is not None:
+            labels["function"] = entry["function"]
+            labels["register"] = "0x%04X" % entry["register"]
+        labels.update(extra)
+        return "{%s}" % ",".join('%s="%s"' % (name, value)
+                                 for name, value in labels.items())
+
+    def export(self, path, output_format="prometheus"):
+        """write the statistics to a file, as "prometheus" or "json"; the
+        file is replaced at once, e.g. for the node exporter textfile collector"""
+        if output_format == "prometheus":
+            text = self.to_prometheus()
+        elif output_format == "json":
+            text = self.to_json()
+        else:
+            raise ValueError("unknown output format " + repr(output_format))
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as stats_file:
+            stats_file.write(text)
+        os.replace(temporary_path, path)
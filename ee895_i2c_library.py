@@ -23,11 +23,22 @@ the information contained in this document.
 """
 
 
+import errno
+import json
+import os
+import random
+import struct
+import threading
+import time
+from collections import namedtuple
+
 # pylint: disable=E0401
 from smbus2 import SMBus, i2c_msg
-import numpy as np
 # pylint: enable=E0401
 CRC16_ONEWIRE_START = 0xFFFF
+DEFAULT_I2C_BUS = 1
+DEFAULT_I2C_ADDRESS = 0x5F
+SIMPLIFIED_I2C_ADDRESS = 0x5E
 FUNCTION_CODE_READ_REGISTER = 0x03
 FUNCTION_CODE_WRITE_REGISTER = 0x06
 READ_ALL_MEASUREMENTS = 0x00
@@ -52,6 +63,10 @@ REGISTER_DETAILED_STATUS = 0x0258
 REGISTER_CO2_MEASURING_INTERVAL = 0x1450
 REGISTER_CO2_FILTER_COEFFICIENT = 0x1451
 REGISTER_CO2_CUSTOMER_OFFSET = 0x1452
+MAX_REGISTERS_PER_READ = 0x08
+MEASUREMENT_REGISTERS = range(REGISTER_TEMPERATURE_CELSIUS, REGISTER_PRESSURE_PSI + 2)
+# errors of the i2c driver when the sensor does not acknowledge
+NACK_ERRNOS = (errno.EREMOTEIO, errno.ENXIO, errno.EIO)
 
 
 def get_status_string(status_code):
@@ -70,61 +85,296 @@ def get_status_string(status_code):
     return "Unknown error"
 
 
-def calc_crc16(buf, end):
-    ''' calculate crc16 checksum  '''
-    buf.insert(0, 0x5F)
-    crc = CRC16_ONEWIRE_START
-    for j in range(end):
-        crc ^= buf[j]
-        for _ in range(8, 0, -1):
+class EE895Error(Warning):
+    """Error in the communication with the sensor, a Warning like the
+    errors raised before there were dedicated exception types."""
+
+
+class CRCError(EE895Error):
+    """The checksum of the response is wrong."""
+
+
+class NackError(OSError, EE895Error):
+    """The sensor did not acknowledge, also an OSError like the smbus2 error."""
+
+
+class WriteVerifyError(EE895Error):
+    """The sensor did not echo the write or the read back value differs."""
+
+
+class RetryPolicy():
+    """How EE895 retries failed transactions: at most attempts tries with
+    exponential backoff and jitter, never longer than deadline seconds.
+    After reset_after failures in a row the bus is reset. With verify_writes
+    every written register is read back."""
+
+    def __init__(self, attempts=3, backoff=0.005, max_backoff=0.1, jitter=0.5,
+                 deadline=None, reset_after=3, verify_writes=False,
+                 clock=time.monotonic, sleep=time.sleep, seed=None):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.deadline = deadline
+        self.reset_after = reset_after
+        self.verify_writes = verify_writes
+        self.clock = clock
+        self.sleep = sleep
+        self._random = random.Random(seed)
+
+    def delay(self, attempt):
+        """waiting time after the failed attempt (1 based)"""
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        return delay * (1 + self.jitter * (2 * self._random.random() - 1))
+
+
+def build_crc16_table():
+    """crc16 (modbus, polynomial 0xA001) of every possible byte value"""
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
             if (crc & 0x0001) != 0:
-                crc = crc >> 1
-                crc ^= 0xA001
+                crc = (crc >> 1) ^ 0xA001
             else:
                 crc = crc >> 1
-    buf.pop(0)
+        table.append(crc)
+    return tuple(table)
+
+
+CRC16_TABLE = build_crc16_table()
+
+
+def crc16(buf, crc=CRC16_ONEWIRE_START):
+    """calculate the crc16 checksum of bytes, a list or a memoryview,
+    buf is not changed"""
+    table = CRC16_TABLE
+    for byte in buf:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
     return crc
 
 
-def convert_to_number(number):
-    """convert the binary code to a float"""
-    count = -1
-    mantissa = 0
-    for i in range(22, 0, -1):
-        mantissa += (((number >> i) & 0x01) * pow(2, count))
-        count -= 1
-    return mantissa + 1
+def crc16_start(i2c_address=DEFAULT_I2C_ADDRESS):
+    """crc start value, the checksum also covers the i2c slave address"""
+    return crc16((i2c_address,))
+
+
+def calc_crc16(buf, end):
+    ''' calculate crc16 checksum  '''
+    return crc16(buf[:end - 1], crc16_start())
+
+
+def modbus_frame(i2c_address, function_code, register_address, value):
+    """build the 8 byte request frame, crc included"""
+    frame = bytearray([function_code, (register_address >> 8),
+                       (register_address & 0xFF), (value >> 8), (value & 0xFF)])
+    crc = crc16(frame, crc16_start(i2c_address))
+    frame.append(crc & 0xFF)
+    frame.append(crc >> 8)
+    return bytes(frame)
+
+
+READ_FRAMES = {}
+
+
+def read_frame(i2c_address, register_address, register_to_read):
+    """return the read request frame for a register, built only once"""
+    key = (i2c_address, register_address, register_to_read)
+    frame = READ_FRAMES.get(key)
+    if frame is None:
+        frame = modbus_frame(i2c_address, FUNCTION_CODE_READ_REGISTER,
+                             register_address, register_to_read)
+        READ_FRAMES[key] = frame
+    return frame
+
+
+FLOAT32_BIG_ENDIAN = struct.Struct(">f")
+FLOAT32_WORD_ORDER = [2, 3, 0, 1]  # the sensor sends the low word first
 
 
 def IEEE754(buf):
     """convert IEEE754 standard to a float"""
-    sign = buf[2] >> 7
-    if sign:
-        sign = -1
-    else:
-        sign = 1
-    biased_exponent = (((buf[2] & 0x7F) << 1) + (buf[3] >> 7))
-    bias_value = 127
-    exponent = biased_exponent - bias_value
-    mantissa = (buf[3] & 0x7F) * 65536 + buf[0] * 256 + buf[1]
-    mantissa = convert_to_number(mantissa)
-    result = sign * mantissa * pow(2, exponent)
-    return result
+    return FLOAT32_BIG_ENDIAN.unpack(bytes((buf[2], buf[3], buf[0], buf[1])))[0]
+
+
+def IEEE754_array(raw):
+    """convert many 4 byte register payloads at once, raw is bytes or an
+    array with 4 bytes per value, returns a numpy float32 array"""
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+        raw = np.frombuffer(raw, dtype=np.uint8)
+    raw = np.asarray(raw, dtype=np.uint8).reshape(-1, 4)
+    ordered = np.ascontiguousarray(raw[:, FLOAT32_WORD_ORDER])
+    return ordered.view(">f4").ravel().astype(np.float32)
+
+
+def decode_uint16(buf):
+    """convert a register to an unsigned integer"""
+    return (buf[0] << 8) + buf[1]
+
+
+Register = namedtuple("Register", ["address", "count", "decoder", "unit"])
+Reading = namedtuple("Reading", ["value", "unit"])
+
+REGISTER_MAP = {
+    "temperature_c": Register(REGISTER_TEMPERATURE_CELSIUS, 2, IEEE754, "°C"),
+    "temperature_f": Register(REGISTER_TEMPERATURE_FAHRENHEIT, 2, IEEE754, "°F"),
+    "temperature_k": Register(REGISTER_TEMPERATURE_KELVIN, 2, IEEE754, "K"),
+    "co2_average_pc": Register(REGISTER_CO2_AVERAGE_PC, 2, IEEE754, "ppm"),
+    "co2_raw_pc": Register(REGISTER_CO2_RAW_PC, 2, IEEE754, "ppm"),
+    "co2_average_npc": Register(REGISTER_CO2_AVERAGE_NPC, 2, IEEE754, "ppm"),
+    "co2_raw_npc": Register(REGISTER_CO2_RAW_NPC, 2, IEEE754, "ppm"),
+    "pressure_mbar": Register(REGISTER_PRESSURE_MBAR, 2, IEEE754, "mbar"),
+    "pressure_psi": Register(REGISTER_PRESSURE_PSI, 2, IEEE754, "psi"),
+    "measuring_status": Register(REGISTER_MEASURING_STATUS, 1, decode_uint16, ""),
+    "status_details": Register(REGISTER_DETAILED_STATUS, 1, decode_uint16, ""),
+}
+
+# settings of the sensor, each with a read_<name> and a change_<name> method
+SETTINGS = ("measuring_mode", "co2_measuring_interval", "co2_filter_coefficient",
+            "co2_custom_offset", "customer_register1", "customer_register2")
+# what the examples print for every measurement
+SAMPLE_QUANTITIES = ("temperature_c", "co2_average_pc", "pressure_mbar")
+# every measurement of REGISTER_MAP
+MEASUREMENT_QUANTITIES = ("temperature_c", "temperature_f", "temperature_k",
+                          "co2_average_pc", "co2_raw_pc", "co2_average_npc",
+                          "co2_raw_npc", "pressure_mbar", "pressure_psi")
+# measurement ranges of the sensor, outside of them status_details flags
+CO2_RANGE = (0.0, 10000.0)
+TEMPERATURE_RANGE = (-40.0, 60.0)
+PRESSURE_RANGE = (700.0, 1100.0)
+Sample = namedtuple("Sample", ["timestamp", "temperature", "co2", "pressure"])
+# data_ready is polled this often per measuring interval while waiting
+STREAM_POLLS_PER_INTERVAL = 10
+# weight of the newest conversion time in a learned conversion time
+CONVERSION_TIME_WEIGHT = 0.25
+
+
+def plan_reads(quantities, max_registers=MAX_REGISTERS_PER_READ, max_gap=0):
+    """group the quantities from REGISTER_MAP into as few contiguous register
+    reads as possible, returns a list of (address, count, quantities).
+    max_gap registers between two quantities are read and thrown away"""
+    blocks = []
+    for name in sorted(set(quantities), key=lambda name: REGISTER_MAP[name].address):
+        register = REGISTER_MAP[name]
+        end = register.address + register.count
+        if blocks:
+            address, count, names = blocks[-1]
+            if (register.address - (address + count) <= max_gap
+                    and end - address <= max_registers):
+                blocks[-1] = (address, max(count, end - address), names + [name])
+                continue
+        blocks.append((register.address, register.count, [name]))
+    return blocks
+
+
+class Transport():
+    """Carries the i2c transactions of EE895, e.g. I2CBus or EE895Simulator."""
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        """get ready for transactions"""
+
+    def close(self):
+        """release the bus"""
+
+    def reset(self):
+        """recover after repeated errors, the bus is reopened on the next
+        transaction"""
+        self.close()
+
+    def write_read(self, i2c_address, buf, receiving_bytes):
+        """write buf to the i2c address and read receiving_bytes back,
+        raises OSError if the device does not acknowledge"""
+        raise NotImplementedError
+
+
+class I2CBus(Transport):
+    """Keeps one SMBus handle open, can be shared by several EE895, also
+    across threads: a lock serialises opening, transactions and closing."""
+
+    def __init__(self, bus_number=DEFAULT_I2C_BUS):
+        self.bus_number = bus_number
+        self._smbus = None
+        self._lock = threading.RLock()
+
+    def open(self):
+        """open the i2c bus, if it is not already open"""
+        with self._lock:
+            if self._smbus is None:
+                self._smbus = SMBus(self.bus_number)
+            return self._smbus
+
+    def close(self):
+        """close the i2c bus, the next transaction opens it again"""
+        with self._lock:
+            smbus, self._smbus = self._smbus, None
+            if smbus is not None:
+                smbus.close()
+
+    def write_read(self, i2c_address, buf, receiving_bytes):
+        """write buf to the i2c address and read receiving_bytes back"""
+        write_command = i2c_msg.write(i2c_address, buf)
+        read_command = i2c_msg.read(i2c_address, receiving_bytes)
+        with self._lock:
+            try:
+                self.open().i2c_rdwr(write_command, read_command)
+            except OSError:
+                # drop the handle, the bus is reopened on the next transaction
+                self.close()
+                raise
+        return list(read_command)
 
 
 class EE895():
     """Implements communication with EE895 over i2c with a specific address."""
 
-    def __init__(self):
-        self.i2c_address = 0x5F
-    
+    def __init__(self, bus=DEFAULT_I2C_BUS, i2c_address=DEFAULT_I2C_ADDRESS,
+                 profile_path=None, instrumentation=None, retry=None, cache=None):
+        """bus is either the i2c bus number or a Transport, e.g. an I2CBus
+        shared with other sensors or an EE895Simulator. Serial number,
+        firmware version and sensor name are read once, with profile_path
+        they are kept in a json file keyed by serial number.
+        instrumentation, e.g. a TransactionStats, records every transaction.
+        retry is a RetryPolicy, without it every error is raised at once.
+        cache, e.g. a RegisterCache, shares measurement register reads."""
+        self.i2c_address = i2c_address
+        self.profile_path = profile_path
+        self.instrumentation = instrumentation
+        self.retry = retry
+        self.cache = cache
+        self._failures = 0
+        self._identity = {}
+        self._settings = {}
+        self._crc_start = crc16_start(i2c_address)
+        self._owns_bus = isinstance(bus, int)
+        if self._owns_bus:
+            self.bus = I2CBus(bus)
+        else:
+            self.bus = bus
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """close the i2c bus, a shared bus is left open for the other sensors"""
+        if self._owns_bus:
+            self.bus.close()
+
     def get_all_measurements(self):
         """get allt the Measurments from the Sensor with i2c simplified"""
-        write_command = i2c_msg.write(0x5E, [0x00])
-        read_command = i2c_msg.read(0x5E, 8)
-        with SMBus(1) as ee895_communication:
-            ee895_communication.i2c_rdwr(write_command, read_command)
-        i2c_response = list(read_command)
+        i2c_response = self._call(self._transaction, None, READ_ALL_MEASUREMENTS,
+                                  [READ_ALL_MEASUREMENTS], 8,
+                                  SIMPLIFIED_I2C_ADDRESS)
         temperature = ((i2c_response[2] << 8) + i2c_response[3]) / 100
         co2 = (i2c_response[0] << 8) + i2c_response[1]
         pressure = ((i2c_response[6] << 8) + i2c_response[7]) / 10
@@ -134,118 +384,147 @@ class EE895():
         """get the temperature in celsius"""
         i2c_response = self.read_bytes_from_register(REGISTER_TEMPERATURE_CELSIUS,
                                                 0x02, 8)
-        temperature = IEEE754([i2c_response[2], i2c_response[3],
-                               i2c_response[4], i2c_response[5]])
+        temperature = IEEE754(i2c_response[2:6])
         return temperature
 
     def get_temp_f(self):
         """get the temperature in fahrenheit"""
         i2c_response = self.read_bytes_from_register(
             REGISTER_TEMPERATURE_FAHRENHEIT, 0x02, 8)
-        temperature = IEEE754([i2c_response[2], i2c_response[3],
-                               i2c_response[4], i2c_response[5]])
+        temperature = IEEE754(i2c_response[2:6])
         return temperature
 
     def get_temp_k(self):
         """get the temperature in Kelvin"""
         i2c_response = self.read_bytes_from_register(
             REGISTER_TEMPERATURE_KELVIN, 0x02, 8)
-        temperature = IEEE754([i2c_response[2], i2c_response[3],
-                               i2c_response[4], i2c_response[5]])
+        temperature = IEEE754(i2c_response[2:6])
         return temperature
 
     def get_co2_aver_with_pc(self):
         """get the co2 value in average mode with pressure compenstaion"""
         i2c_response = self.read_bytes_from_register(
             REGISTER_CO2_AVERAGE_PC, 0x02, 8)
-        co2 = IEEE754([i2c_response[2], i2c_response[3],
-                       i2c_response[4], i2c_response[5]])
+        co2 = IEEE754(i2c_response[2:6])
         return co2
 
     def get_co2_raw_with_pc(self):
         """get the co2 value raw with pressure compenstaion"""
         i2c_response = self.read_bytes_from_register(
             REGISTER_CO2_RAW_PC, 0x02, 8)
-        co2 = IEEE754([i2c_response[2], i2c_response[3],
-                       i2c_response[4], i2c_response[5]])
+        co2 = IEEE754(i2c_response[2:6])
         return co2
 
     def get_co2_aver_with_npc(self):
         """get the co2 value in average mode with no pressure compenstaion"""
         i2c_response = self.read_bytes_from_register(
             REGISTER_CO2_AVERAGE_NPC, 0x02, 8)
-        co2 = IEEE754([i2c_response[2], i2c_response[3],
-                       i2c_response[4], i2c_response[5]])
+        co2 = IEEE754(i2c_response[2:6])
         return co2
 
     def get_co2_raw_with_npc(self):
         """get the co2 value raw with no pressure compenstaion"""
-        i2c_response = read_bytes_from_register(
+        i2c_response = self.read_bytes_from_register(
             REGISTER_CO2_RAW_NPC, 0x02, 8)
-        co2 = IEEE754([i2c_response[2], i2c_response[3],
-                       i2c_response[4], i2c_response[5]])
+        co2 = IEEE754(i2c_response[2:6])
         return co2
 
     def get_pressure_mbar(self):
         """get the pressure value in mbar"""
         i2c_response = self.read_bytes_from_register(
             REGISTER_PRESSURE_MBAR, 0x02, 8)
-        pressure = IEEE754([i2c_response[2], i2c_response[3],
-                            i2c_response[4], i2c_response[5]])
+        pressure = IEEE754(i2c_response[2:6])
         return pressure
 
     def get_pressure_psi(self):
         """get the pressure value in psi"""
         i2c_response = self.read_bytes_from_register(
             REGISTER_PRESSURE_PSI, 0x02, 8)
-        pressure = IEEE754([i2c_response[2], i2c_response[3],
-                            i2c_response[4], i2c_response[5]])
+        pressure = IEEE754(i2c_response[2:6])
         return pressure
 
+    def read_many(self, quantities, max_gap=0):
+        """read several quantities of REGISTER_MAP with as few transactions
+        as possible, returns a dict of quantity => Reading(value, unit)"""
+        readings = {}
+        for address, count, names in plan_reads(quantities, max_gap=max_gap):
+            i2c_response = self.read_bytes_from_register(address, count,
+                                                         2 * count + 4)
+            for name in names:
+                register = REGISTER_MAP[name]
+                offset = 2 + 2 * (register.address - address)
+                readings[name] = Reading(
+                    register.decoder(i2c_response[offset:offset + 2 * register.count]),
+                    register.unit)
+        return readings
+
+    def stream(self, max_samples=None, clock=time.monotonic, sleep=time.sleep):
+        """yield a Sample for every new measurement of the continuous mode.
+
+        The measuring interval is read once, data_ready is checked on a
+        fixed schedule of absolute deadlines and the values are only read
+        when there is new data. Data ready at the first poll moves the
+        next poll one step earlier, so the polls lock onto the
+        measurements of the sensor. Measurements missed while the consumer was
+        busy are dropped, the next Sample holds the latest values.
+        stream_stats counts samples, polls, dropped samples and the
+        transactions saved compared to reading blindly on every poll.
+        """
+        interval = self.read_co2_measuring_interval() / 10
+        poll_interval = interval / STREAM_POLLS_PER_INTERVAL
+        transactions_per_read = len(plan_reads(SAMPLE_QUANTITIES))
+        stats = self.stream_stats = {"samples": 0, "polls": 0, "dropped": 0,
+                                     "saved_transactions": 0}
+        deadline = clock()
+        first_poll = True
+        while max_samples is None or stats["samples"] < max_samples:
+            stats["polls"] += 1
+            if self.data_ready():
+                readings = self.read_many(SAMPLE_QUANTITIES)
+                stats["samples"] += 1
+                yield Sample(clock(), *(readings[name].value for name in SAMPLE_QUANTITIES))
+                # ready at the first poll: the measurement may have come
+                # earlier, poll a step earlier next time to lock onto it
+                deadline += interval - poll_interval if first_poll else interval
+                first_poll = True
+            else:
+                stats["saved_transactions"] += transactions_per_read
+                deadline += poll_interval
+                first_poll = False
+            now = clock()
+            if now - deadline >= interval:
+                missed = int((now - deadline) // interval)
+                stats["dropped"] += missed
+                deadline += missed * interval
+            sleep(max(deadline - now, 0))
+
     def read_serial_number(self):
         """get the serial number"""
-        i2c_response = self.read_bytes_from_register(
-            REGISTER_SERIAL_NUMBER, 0x08, 20)
-        i2c_response.pop(0)
-        i2c_response.pop(0)
-        i2c_response.pop(17)
-        i2c_response.pop(16)
-        return i2c_response
+        return self._read_identity("serial_number", REGISTER_SERIAL_NUMBER, 0x08)
 
     def read_firmware_version(self):
         """get the firmware version"""
-        i2c_response = self.read_bytes_from_register(
-            REGISTER_FIRMWARE_VERSION, 0x01, 6)
-        i2c_response.pop(0)
-        i2c_response.pop(0)
-        i2c_response.pop(3)
-        i2c_response.pop(2)
-        return i2c_response
+        return self._read_identity("firmware_version", REGISTER_FIRMWARE_VERSION, 0x01)
 
     def read_sensor_name(self):
         """get the sensor name"""
-        i2c_response = self.read_bytes_from_register(
-            REGISTER_SENSORNAME, 0x08, 20)
-        i2c_response.pop(0)
-        i2c_response.pop(0)
-        i2c_response.pop(17)
-        i2c_response.pop(16)
-        return i2c_response
+        return self._read_identity("sensor_name", REGISTER_SENSORNAME, 0x08)
 
     def read_measuring_mode(self):
         """read the measuring mode, 0 => continuous mode, 1 => single shot"""
-        i2c_response = self.read_bytes_from_register(
-            REGISTER_MEASURING_MODE, 0x01, 6)
-        return i2c_response[3] & 0x01
+        return self._read_setting(REGISTER_MEASURING_MODE) & 0x01
 
     def change_measuring_mode(self, measuring_mode):
         """change the measuring mode, 0 => continuous mode, 1 => single shot"""
-        self.write_to_register(REGISTER_MEASURING_MODE, [0x00, measuring_mode])
+        return self._write_setting(REGISTER_MEASURING_MODE, [0x00, measuring_mode])
 
     def data_ready(self):
         """shows if the data is ready to be read"""
         i2c_response = self.read_bytes_from_register(
             REGISTER_MEASURING_STATUS, 0x01, 6)
+        if self.cache is not None and i2c_response[3] & 0x01:
+            # new measurement, the cached values are outdated
+            self.cache.invalidate()
         return i2c_response[3] & 0x01
 
     def trigger_ready(self):
@@ -256,7 +535,19 @@ class EE895():
 
     def trigger_new_measurement(self):
         """triggers a new measuremnet, but only in single shot mode"""
-        self.write_to_register(REGISTER_MEASURING_TRIGGER, [0x00, 0x01])
+        sent = []
+
+        def trigger():
+            # a trigger with a corrupted echo may have started the conversion,
+            # the sensor would reject a second one, so it is only sent again
+            # if the sensor is still ready for a trigger
+            if sent and not self._read_bytes_from_register(
+                    REGISTER_MEASURING_STATUS, 0x01, 6)[3] & 0x02:
+                return
+            sent.append(True)
+            self._write_to_register(REGISTER_MEASURING_TRIGGER, [0x00, 0x01])
+
+        self._call(trigger)
 
     def status_details(self):
         """ Bit 0 = Co2 measurment too high, Bit 1 = Co2 measurment too low,
@@ -269,102 +560,239 @@ class EE895():
     def change_co2_measuring_interval(self, measuring_interval):
         """change the measuring interval of the sensor in continuous mode"""
         if 36001 > measuring_interval & measuring_interval > 99:
-            self.write_to_register(REGISTER_CO2_MEASURING_INTERVAL,
-                              [np.uint8(measuring_interval / 256),
-                               np.uint8(measuring_interval % 256)])
+            return self._write_setting(REGISTER_CO2_MEASURING_INTERVAL,
+                                       [measuring_interval >> 8,
+                                        measuring_interval & 0xFF])
         else:
             raise Warning(get_status_string(4))
 
     def read_co2_measuring_interval(self):
         """read the measuring interval of the sensor in continuous mode"""
-        i2c_response = self.read_bytes_from_register(
-            REGISTER_CO2_MEASURING_INTERVAL, 0x01, 6)
-        return (i2c_response[2] << 8) + i2c_response[3]
+        return self._read_setting(REGISTER_CO2_MEASURING_INTERVAL)
 
     def change_co2_filter_coefficient(self, filter_coefficient):
         """change the filter coefficient of the sensor"""
         if 21 > filter_coefficient & filter_coefficient > 0:
-            self.write_to_register(REGISTER_CO2_FILTER_COEFFICIENT,
-                              [0x00, filter_coefficient])
+            return self._write_setting(REGISTER_CO2_FILTER_COEFFICIENT,
+                                       [0x00, filter_coefficient])
         else:
             raise Warning(get_status_string(5))
 
     def read_co2_filter_coefficient(self):
         """read the filter coefficient of the sensor"""
-        i2c_response = self.read_bytes_from_register(
-            REGISTER_CO2_FILTER_COEFFICIENT, 0x01, 6)
-        return (i2c_response[2] << 8) + i2c_response[3]
+        return self._read_setting(REGISTER_CO2_FILTER_COEFFICIENT)
 
     def change_co2_custom_offset(self, custom_offset):
         """change the customer offset of the sensor for co2"""
-        buf = np.uint16(custom_offset)
-        self.write_to_register(REGISTER_CO2_CUSTOMER_OFFSET,
-                          [np.uint8(buf / 256), np.uint8(buf % 256)])
+        buf = custom_offset & 0xFFFF
+        return self._write_setting(REGISTER_CO2_CUSTOMER_OFFSET, [buf >> 8, buf & 0xFF])
 
     def read_co2_custom_offset(self):
         """read the customer offset of the sensor for co2"""
-        i2c_response = self.read_bytes_from_register(
-            REGISTER_CO2_CUSTOMER_OFFSET, 0x01, 6)
-        buf = np.int16((i2c_response[2] << 8) + i2c_response[3])
-        return buf
+        buf = self._read_setting(REGISTER_CO2_CUSTOMER_OFFSET)
+        return buf - 0x10000 if buf & 0x8000 else buf
 
     def change_customer_register1(self, customer_register):
         """since firmware version 1.1.1, registers reserved
         for any customer use, e.g. serial number, traceability, etc."""
-        self.write_to_register(USER_REGISTER_1, [(customer_register >> 8),
-                                            (customer_register and 0xFF)])
+        return self._write_setting(USER_REGISTER_1, [(customer_register >> 8),
+                                                     (customer_register & 0xFF)])
 
     def read_customer_register1(self):
         """since firmware version 1.1.1, registers reserved
         for any customer use, e.g. serial number, traceability, etc."""
-        i2c_response = self.read_bytes_from_register(USER_REGISTER_1, 0x01, 6)
-        return (i2c_response[2] << 8) + i2c_response[3]
+        return self._read_setting(USER_REGISTER_1)
 
     def change_customer_register2(self, customer_register):
         """since firmware version 1.1.1, registers reserved
         for any customer use, e.g. serial number, traceability, etc."""
-        self.write_to_register(USER_REGISTER_2, [(customer_register >> 8),
-                                            (customer_register and 0xFF)])
+        return self._write_setting(USER_REGISTER_2, [(customer_register >> 8),
+                                                     (customer_register & 0xFF)])
 
     def read_customer_register2(self):
         """since firmware version 1.1.1, registers reserved
         for any customer use, e.g. serial number, traceability, etc."""
-        i2c_response = self.read_bytes_from_register(USER_REGISTER_2, 0x01, 6)
-        return (i2c_response[2] << 8) + i2c_response[3]
+        return self._read_setting(USER_REGISTER_2)
+
+    def apply_config(self, config):
+        """bring the sensor to the settings in config, e.g.
+        {"measuring_mode": 0, "co2_measuring_interval": 150}, with as few
+        writes as possible, returns the names of the written settings"""
+        unknown = set(config) - set(SETTINGS)
+        if unknown:
+            raise ValueError("unknown settings: " + ", ".join(sorted(unknown)))
+        return [name for name, value in config.items()
+                if getattr(self, "change_" + name)(value)]
+
+    def read_config(self):
+        """read all settings of SETTINGS"""
+        return {name: getattr(self, "read_" + name)() for name in SETTINGS}
+
+    def clear_cache(self):
+        """forget the cached settings, e.g. after another program changed them"""
+        self._settings.clear()
+
+    def _read_setting(self, register_address):
+        """read a setting register, it is fetched from the sensor only once"""
+        if register_address not in self._settings:
+            i2c_response = self.read_bytes_from_register(register_address, 0x01, 6)
+            self._settings[register_address] = (i2c_response[2] << 8) + i2c_response[3]
+        return self._settings[register_address]
+
+    def _write_setting(self, register_address, bytes_to_write):
+        """write a setting register unless it already holds the value,
+        returns True if it was written"""
+        value = (int(bytes_to_write[0]) << 8) + int(bytes_to_write[1])
+        if self._read_setting(register_address) == value:
+            return False
+        try:
+            self.write_to_register(register_address, bytes_to_write)
+        finally:
+            # written or maybe written by a failed write, the next read
+            # fetches the register again
+            self._settings.pop(register_address, None)
+        return True
+
+    def _read_identity(self, name, register_address, register_to_read):
+        """read a value of the identity only once, it is looked up in and
+        stored to the profile file if the sensor has a profile_path"""
+        if name not in self._identity:
+            if self.profile_path is not None and name != "serial_number":
+                self.read_serial_number()
+        if name not in self._identity:
+            i2c_response = self.read_bytes_from_register(
+                register_address, register_to_read, 2 * register_to_read + 4)
+            self._identity[name] = i2c_response[2:-2]
+            if self.profile_path is not None:
+                self._load_profile()
+                self._save_profile()
+        return list(self._identity[name])
+
+    def _profiles(self):
+        """all profiles of the profile file, keyed by serial number"""
+        try:
+            with open(self.profile_path, encoding="utf-8") as profile_file:
+                return json.load(profile_file)
+        except FileNotFoundError:
+            return {}
+
+    def _load_profile(self):
+        """take the identity of this serial number from the profile file"""
+        serial_number = bytes(self._identity["serial_number"]).hex()
+        for name, value in self._profiles().get(serial_number, {}).items():
+            self._identity.setdefault(name, value)
+
+    def _save_profile(self):
+        """store the identity in the profile file"""
+        profiles = self._profiles()
+        serial_number = bytes(self._identity["serial_number"]).hex()
+        profiles[serial_number] = {name: value for name, value in self._identity.items()
+                                   if name != "serial_number"}
+        temporary_path = self.profile_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as profile_file:
+            json.dump(profiles, profile_file)
+        os.replace(temporary_path, self.profile_path)
 
     def read_bytes_from_register(self, register_address, register_to_read, bytes_to_read):
         """ read bytes from the register addrdss"""
-        command = [FUNCTION_CODE_READ_REGISTER, (register_address >> 8),
-                   (register_address & 0xFF), (register_to_read >> 8),
-                   (register_to_read & 0xFF)]
-        crc = calc_crc16(command, 6)
-        command.append(crc & 0xFF)
-        command.append(crc >> 8)
-        i2c_response = self.wire_write_read(command, bytes_to_read)
-        crc_check = i2c_response[bytes_to_read - 1] * 256 + i2c_response[bytes_to_read - 2]
-        if (crc_check - calc_crc16(i2c_response, (bytes_to_read - 1))) == 0:
-            return i2c_response
-        else:
-            raise Warning(get_status_string(2))
+        if self.cache is not None and register_address in MEASUREMENT_REGISTERS:
+            return self.cache.get(
+                (register_address, register_to_read, bytes_to_read),
+                lambda: self._call(self._read_bytes_from_register, register_address,
+                                   register_to_read, bytes_to_read))
+        return self._call(self._read_bytes_from_register, register_address,
+                          register_to_read, bytes_to_read)
 
     def write_to_register(self, register_address, bytes_to_write):
         """writes 2 uint8_t to the register address"""
-        command = [FUNCTION_CODE_WRITE_REGISTER, (register_address >> 8),
-                   (register_address & 0xFF), (bytes_to_write[0]),
-                   (bytes_to_write[1])]
-        crc = calc_crc16(command, 6)
-        command.append(crc & 0xFF)
-        command.append(crc >> 8)
-        i2c_response = self.wire_write_read(command, 7)
-        if command == i2c_response:
-            return
+        self._call(self._write_to_register, register_address, bytes_to_write)
+
+    def _read_bytes_from_register(self, register_address, register_to_read, bytes_to_read):
+        """one read of the register address, without retries"""
+        command = read_frame(self.i2c_address, register_address,
+                             register_to_read)
+        i2c_response = self._transaction(FUNCTION_CODE_READ_REGISTER,
+                                         register_address, command, bytes_to_read)
+        crc_check = i2c_response[bytes_to_read - 1] * 256 + i2c_response[bytes_to_read - 2]
+        if crc_check == crc16(i2c_response[:bytes_to_read - 2], self._crc_start):
+            return i2c_response
         else:
-            raise Warning(get_status_string(3))
+            if self.instrumentation is not None:
+                self.instrumentation.error(FUNCTION_CODE_READ_REGISTER,
+                                           register_address, "crc")
+            raise CRCError(get_status_string(2))
+
+    def _write_to_register(self, register_address, bytes_to_write):
+        """one write of the register address, without retries"""
+        value = (int(bytes_to_write[0]) << 8) + int(bytes_to_write[1])
+        command = modbus_frame(self.i2c_address, FUNCTION_CODE_WRITE_REGISTER,
+                               register_address, value)
+        i2c_response = self._transaction(FUNCTION_CODE_WRITE_REGISTER,
+                                         register_address, command, 7)
+        if list(command) != i2c_response:
+            if self.instrumentation is not None:
+                self.instrumentation.error(FUNCTION_CODE_WRITE_REGISTER,
+                                           register_address, "write_echo")
+            raise WriteVerifyError(get_status_string(3))
+        if (self.retry is not None and self.retry.verify_writes
+                and register_address != REGISTER_MEASURING_TRIGGER):
+            i2c_response = self._read_bytes_from_register(register_address, 0x01, 6)
+            if (i2c_response[2] << 8) + i2c_response[3] != value:
+                raise WriteVerifyError(get_status_string(3))
 
     def wire_write_read(self,  buf, receiving_bytes):
         """write a command to the sensor to get different answers like temperature values,..."""
-        write_command = i2c_msg.write(self.i2c_address, buf)
-        read_command = i2c_msg.read(self.i2c_address, receiving_bytes)
-        with SMBus(1) as ee895_communication:
-            ee895_communication.i2c_rdwr(write_command, read_command)
-        return list(read_command)
+        return self.bus.write_read(self.i2c_address, buf, receiving_bytes)
+
+    def _transaction(self, function_code, register_address, buf, receiving_bytes,
+                     i2c_address=None):
+        """one write/read on the bus, recorded if instrumentation is switched on,
+        the function code of the simplified protocol is None"""
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            start = time.perf_counter()
+        try:
+            if i2c_address is None:
+                i2c_response = self.wire_write_read(buf, receiving_bytes)
+            else:
+                i2c_response = self.bus.write_read(i2c_address, buf, receiving_bytes)
+        except OSError as exception:
+            if instrumentation is not None:
+                instrumentation.transaction(function_code, register_address,
+                                            time.perf_counter() - start, len(buf), 0,
+                                            "nack")
+            if exception.errno in NACK_ERRNOS:
+                raise NackError(exception.errno, get_status_string(1)) from exception
+            raise
+        if instrumentation is not None:
+            instrumentation.transaction(function_code, register_address,
+                                        time.perf_counter() - start, len(buf),
+                                        receiving_bytes)
+        return i2c_response
+
+    def _call(self, function, *args):
+        """call function, retrying NACKs, crc and write errors as the retry
+        policy says; after reset_after failures in a row the bus is reset"""
+        retry = self.retry
+        if retry is None:
+            return function(*args)
+        start = retry.clock()
+        attempt = 0
+        while True:
+            try:
+                result = function(*args)
+            except EE895Error:
+                attempt += 1
+                self._failures += 1
+                if self._failures >= retry.reset_after:
+                    self._failures = 0
+                    self.bus.reset()
+                delay = retry.delay(attempt)
+                if attempt >= retry.attempts or (
+                        retry.deadline is not None
+                        and retry.clock() - start + delay > retry.deadline):
+                    raise
+                retry.sleep(delay)
+            else:
+                self._failures = 0
+                return result
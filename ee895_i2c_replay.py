@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Recording and replay of the i2c traffic of EE895 Sensors.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+
+A capture is the magic "EE895CAP" followed by one record per transaction:
+seconds since the start of the recording (float64), duration (float32),
+i2c address, request length, errno (0 if acknowledged), number of bytes
+to read (uint16), the request and, if acknowledged, the response.
+"""
+
+import errno
+import os
+import struct
+import time
+from collections import namedtuple
+
+from ee895_i2c_library import Transport
+
+CAPTURE_MAGIC = b"EE895CAP"
+CAPTURE_RECORD = struct.Struct("<dfBBBH")
+
+CapturedTransaction = namedtuple("CapturedTransaction", [
+    "time", "duration", "i2c_address", "request", "receiving_bytes",
+    "response", "errno"])
+
+
+def read_capture(path):
+    """yield the CapturedTransaction of a capture one by one, a record cut
+    short at the end of the file is ignored"""
+    with open(path, "rb") as capture_file:
+        if capture_file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError("not an EE895 capture")
+        while True:
+            header = capture_file.read(CAPTURE_RECORD.size)
+            if len(header) < CAPTURE_RECORD.size:
+                return
+            (offset, duration, i2c_address, request_length, error,
+             receiving_bytes) = CAPTURE_RECORD.unpack(header)
+            response_length = 0 if error else receiving_bytes
+            payload = capture_file.read(request_length + response_length)
+            if len(payload) < request_length + response_length:
+                return
+            yield CapturedTransaction(offset, duration, i2c_address,
+                                      list(payload[:request_length]), receiving_bytes,
+                                      list(payload[request_length:]), error)
+
+
+class RecordingTransport(Transport):
+    """Passes the transactions to another transport and appends each of
+    them to a capture file, NACKs included.
+
+    Records go through the buffer of the file, flush() writes them out, so
+    a long recording does not grow in memory. close() ends the recording.
+    """
+
+    def __init__(self, transport, path, clock=time.monotonic):
+        self.transport = transport
+        self.path = path
+        self.clock = clock
+        self.transactions = 0
+        self._file = open(path, "wb")  # pylint: disable=consider-using-with
+        self._file.write(CAPTURE_MAGIC)
+        self._start = clock()
+
+    def open(self):
+        """open the recorded transport"""
+        return self.transport.open()
+
+    def close(self):
+        """close the recorded transport and finish the capture file"""
+        self.transport.close()
+        self.stop()
+
+    def reset(self):
+        """reset the recorded transport"""
+        self.transport.reset()
+
+    def flush(self):
+        """write the buffered records to the capture file"""
+        if not self._file.closed:
+            self._file.flush()
+
+    def stop(self):
+        """finish the capture file, the transport stays usable"""
+        self._file.close()
+
+    def write_read(self, i2c_address, buf, receiving_bytes):
+        """do the transaction on the recorded transport and record it"""
+        start = self.clock()
+        try:
+            response = self.transport.write_read(i2c_address, buf, receiving_bytes)
+        except OSError as exception:
+            self._record(start, i2c_address, buf, receiving_bytes, [],
+                         exception.errno or errno.EIO)
+            raise
+        self._record(start, i2c_address, buf, receiving_bytes, response, 0)
+        return response
+
+    def _record(self, start, i2c_address, buf, receiving_bytes, response, error):
+        """append one record to the capture file"""
+        if self._file.closed:
+            return
+        self._file.write(CAPTURE_RECORD.pack(start - self._start, self.clock() - start,
+                                             i2c_address, len(buf), error,
+                                             receiving_bytes)
+                         + bytes(buf) + bytes(response))
+        self.transactions += 1
+
+
+class ReplayTransport(Transport):
+    """Answers the transactions of an EE895 from a capture, in order.
+
+    Without speed the answers come at once, else at the recorded pace
+    divided by speed (2.0 replays twice as fast). strict checks that every
+    request equals the recorded one and raises ValueError if it does not;
+    EOFError is raised when the capture is used up.
+    """
+
+    def __init__(self, path, speed=None, strict=True, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.path = path
+        self.speed = speed
+        self.strict = strict
+        self.clock = clock
+        self.sleep = sleep
+        self.transactions = 0
+        self._transactions = read_capture(path)
+        self._start = None
+
+    def close(self):
+        """stop reading the capture"""
+        self._transactions.close()
+
+    def reset(self):
+        """nothing to recover, the capture goes on"""
+
+    def write_read(self, i2c_address, buf, receiving_bytes):
+        """answer with the next recorded transaction"""
+        transaction = next(self._transactions, None)
+        if transaction is None:
+            raise EOFError("the capture %s is used up" % self.path)
+        if self.strict and (transaction.i2c_address != i2c_address
+                            or transaction.request != list(buf)
+                            or transaction.receiving_bytes != receiving_bytes):
+            raise ValueError("transaction %d differs from the capture: 0x%02X %s, "
+                             "recorded 0x%02X %s"
+                             % (self.transactions, i2c_address, list(buf),
+                                transaction.i2c_address, transaction.request))
+        self.transactions += 1
+        if self.speed is not None:
+            if self._start is None:
+                self._start = self.clock() - transaction.time / self.speed
+            due = self._start + (transaction.time + transaction.duration) / self.speed
+            delay = due - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+        if transaction.errno:
+            raise OSError(transaction.errno, os.strerror(transaction.errno))
+        return list(transaction.response)
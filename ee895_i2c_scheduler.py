@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Fixed rate sampling of EE895 Sensors on absolute deadlines.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+"""
+
+import math
+import time
+from collections import deque
+
+from ee895_i2c_library import SAMPLE_QUANTITIES
+
+# what happens to the deadlines missed while a job overran
+SKIP = "skip"
+CATCH_UP = "catch_up"
+# start delays kept per job for the jitter percentiles
+JITTER_HISTORY = 1000
+
+
+class VirtualClock():
+    """Clock for the scheduler and EE895Simulator, sleep() moves the time
+    on at once, so hours of sampling run in a moment."""
+
+    def __init__(self, start=0.0, wall_offset=1.7e9):
+        self.now = start
+        self.wall_offset = wall_offset
+
+    def monotonic(self):
+        """the monotonic time"""
+        return self.now
+
+    def time(self):
+        """the wall clock time"""
+        return self.now + self.wall_offset
+
+    def sleep(self, seconds):
+        """let seconds pass"""
+        self.now += max(seconds, 0.0)
+
+
+class Job():
+    """A function the scheduler calls every interval seconds."""
+
+    def __init__(self, function, interval, phase, align, policy, name):
+        self.function = function
+        self.interval = interval
+        self.phase = phase
+        self.align = align
+        self.policy = policy
+        self.name = name
+        self.deadline = None
+        self.wall_deadline = None
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_error = None
+        self.jitter = deque(maxlen=JITTER_HISTORY)
+        self.max_jitter = 0.0
+
+    def stats(self):
+        """runs, overruns, skipped deadlines, errors and the jitter (start
+        after the deadline) in seconds"""
+        jitter = sorted(self.jitter)
+        return {"runs": self.runs, "overruns": self.overruns, "skipped": self.skipped,
+                "errors": self.errors,
+                "jitter_mean": sum(jitter) / len(jitter) if jitter else 0.0,
+                "jitter_p99": jitter[int(0.99 * (len(jitter) - 1))] if jitter else 0.0,
+                "jitter_max": self.max_jitter}
+
+
+class SamplingScheduler():
+    """Runs jobs at fixed rates on absolute monotonic deadlines, so the bus
+    time of a job does not delay the next run and the schedule does not
+    drift.
+
+    Jobs with align have their deadlines on multiples of the interval of
+    the wall clock (plus the phase); the offset between wall clock and
+    monotonic clock is taken again for every deadline, so they follow the
+    wall clock as it is adjusted. A run ending after the next deadline is
+    an overrun: SKIP drops the missed deadlines, CATCH_UP runs them back
+    to back. Jobs added without a phase are staggered evenly over their
+    interval to spread the bus load. Exceptions of a job (OSError and
+    Warning) are counted, the schedule goes on.
+    """
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep, wall_clock=time.time):
+        self.clock = clock
+        self.sleep = sleep
+        self.wall_clock = wall_clock
+        self.jobs = []
+        self._stopped = False
+
+    @classmethod
+    def virtual(cls, virtual_clock=None):
+        """scheduler on a VirtualClock, without real sleeps"""
+        virtual_clock = virtual_clock or VirtualClock()
+        return cls(virtual_clock.monotonic, virtual_clock.sleep, virtual_clock.time)
+
+    def add(self, function, interval, phase=None, align=False, policy=SKIP, name=None):
+        """call function() every interval seconds and return its Job"""
+        if policy not in (SKIP, CATCH_UP):
+            raise ValueError("unknown overrun policy " + repr(policy))
+        job = Job(function, interval, phase, align, policy,
+                  name or getattr(function, "__name__", "job %d" % len(self.jobs)))
+        self.jobs.append(job)
+        return job
+
+    def add_sensor(self, sensor, callback, interval, quantities=SAMPLE_QUANTITIES, **options):
+        """read quantities of sensor every interval seconds and pass the
+        readings to callback"""
+        def sample():
+            callback(sensor.read_many(quantities))
+        return self.add(sample, interval, **options)
+
+    def stop(self):
+        """end run() after the current job"""
+        self._stopped = True
+
+    def run(self, duration=None, runs=None):
+        """run the jobs for duration seconds or until runs calls were made,
+        forever without both"""
+        self._stopped = False
+        start = self.clock()
+        self._schedule(start)
+        calls = 0
+        while not self._stopped and self.jobs and (runs is None or calls < runs):
+            job = min(self.jobs, key=lambda job: job.deadline)
+            if duration is not None and job.deadline >= start + duration:
+                self.sleep(start + duration - self.clock())
+                return
+            delay = job.deadline - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+            self._run(job)
+            calls += 1
+
+    def _schedule(self, now):
+        """first deadline of every job, phases of the jobs without one are
+        spread over the interval among the jobs of the same interval"""
+        intervals = {}
+        for job in self.jobs:
+            if job.phase is None:
+                intervals.setdefault(job.interval, []).append(job)
+        phases = {}
+        for interval, jobs in intervals.items():
+            for index, job in enumerate(jobs):
+                phases[job] = index * interval / len(jobs)
+        for job in self.jobs:
+            phase = phases.get(job, job.phase)
+            if job.align:
+                wall = self.wall_clock()
+                job.wall_deadline = math.ceil((wall - phase) / job.interval) * job.interval + phase
+                job.deadline = job.wall_deadline - wall + now
+            else:
+                job.deadline = now + phase
+
+    def _run(self, job):
+        """run a job and set its next deadline"""
+        started = self.clock()
+        lateness = started - job.deadline
+        job.jitter.append(lateness)
+        job.max_jitter = max(job.max_jitter, lateness)
+        try:
+            job.function()
+        except (OSError, Warning) as exception:
+            job.errors += 1
+            job.last_error = exception
+        job.runs += 1
+        if job.align:
+            job.wall_deadline += job.interval
+            job.deadline = job.wall_deadline - self.wall_clock() + self.clock()
+        else:
+            job.deadline += job.interval
+        now = self.clock()
+        if now > job.deadline:
+            job.overruns += 1
+            if job.policy == SKIP:
+                missed = math.floor((now - job.deadline) / job.interval) + 1
+                job.skipped += missed
+                job.deadline += missed * job.interval
+                if job.align:
+                    job.wall_deadline += missed * job.interval
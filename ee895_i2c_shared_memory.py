@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Publication of the latest EE895 sample through shared memory.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+"""
+
+import math
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from ee895_i2c_library import EE895Error, MEASUREMENT_QUANTITIES
+
+DEFAULT_SHARED_MEMORY_NAME = "ee895"
+# layout of the block, the sequence is odd while the publisher writes
+SHARED_SAMPLE = np.dtype([("sequence", "<u8"), ("timestamp", "<f8")]
+                         + [(name, "<f4") for name in MEASUREMENT_QUANTITIES]
+                         + [("status_details", "<u2")], align=True)
+SEQUENCE_SIZE = SHARED_SAMPLE.fields["sequence"][0].itemsize
+# attempts of a reader before it gives up on a publisher stuck mid-write
+SNAPSHOT_ATTEMPTS = 100000
+
+
+def attach(name, create=False):
+    """open the shared memory block of name; a reader must not unlink the
+    block when it exits, so it is kept away from the resource tracker"""
+    if create:
+        return shared_memory.SharedMemory(name, create=True, size=SHARED_SAMPLE.itemsize)
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:  # python before 3.13 knows no track and always registers
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedMemoryPublisher():
+    """Writes the latest sample into a shared memory block.
+
+    There must be one publisher per block. Every sample is written with a
+    seqlock: the sequence is made odd, the fields are copied in one go and
+    the sequence is made even again, so readers never wait on a lock.
+    """
+
+    def __init__(self, name=DEFAULT_SHARED_MEMORY_NAME):
+        self.block = attach(name, create=True)
+        self.block.buf[:SHARED_SAMPLE.itemsize] = bytes(SHARED_SAMPLE.itemsize)
+        self._sequence = self.block.buf[:SEQUENCE_SIZE].cast("Q")
+        self._fields = self.block.buf[SEQUENCE_SIZE:SHARED_SAMPLE.itemsize]
+        self._staging = np.zeros((), SHARED_SAMPLE)
+        self._staged_fields = memoryview(self._staging.reshape(1).view(np.uint8))[SEQUENCE_SIZE:]
+
+    @property
+    def name(self):
+        """name of the shared memory block"""
+        return self.block.name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """release and remove the block, attached readers keep their mapping"""
+        self._sequence.release()
+        self._fields.release()
+        self._staged_fields.release()
+        self.block.close()
+        self.block.unlink()
+
+    def publish(self, readings, timestamp=None):
+        """publish a dict of quantity => Reading or number, quantities
+        missing in readings are published as nan"""
+        staging = self._staging
+        staging["timestamp"] = time.time() if timestamp is None else timestamp
+        for name in MEASUREMENT_QUANTITIES:
+            reading = readings.get(name)
+            if reading is None:
+                staging[name] = math.nan
+            else:
+                staging[name] = getattr(reading, "value", reading)
+        status_details = readings.get("status_details", 0)
+        staging["status_details"] = getattr(status_details, "value", status_details)
+        sequence = self._sequence[0]
+        self._sequence[0] = sequence + 1
+        self._fields[:] = self._staged_fields
+        self._sequence[0] = sequence + 2
+        return (sequence + 2) // 2
+
+    def publish_sensor(self, sensor):
+        """read all measurements and status_details of sensor and publish them"""
+        return self.publish(sensor.read_many(MEASUREMENT_QUANTITIES + ("status_details",)))
+
+
+class SharedMemoryReader():
+    """Reads the samples of a SharedMemoryPublisher, in this or another process.
+
+    view is a structured NumPy view of the block itself, its fields may
+    change while they are read; snapshot() returns a consistent copy.
+    Python has no memory fences, the seqlock relies on the stores of the
+    publisher becoming visible in order: x86 guarantees that, on ARM a torn
+    snapshot is unlikely but not ruled out.
+    """
+
+    def __init__(self, name=DEFAULT_SHARED_MEMORY_NAME):
+        self.block = attach(name)
+        self.view = np.ndarray((), SHARED_SAMPLE, self.block.buf)
+        self._sequence = self.block.buf[:SEQUENCE_SIZE].cast("Q")
+        self._block_bytes = self.block.buf[:SHARED_SAMPLE.itemsize]
+        self._out = None
+        self._target = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """detach from the block"""
+        del self.view
+        self._sequence.release()
+        self._block_bytes.release()
+        if self._target is not None:
+            self._target.release()
+        self.block.close()
+
+    def sequence(self):
+        """number of samples published so far, compare it to see new samples"""
+        return self._sequence[0] // 2
+
+    def snapshot(self, out=None):
+        """consistent copy of the latest sample, written into out when given
+        (a 0-d array of SHARED_SAMPLE) so polling loops do not allocate"""
+        if out is None:
+            out = np.zeros((), SHARED_SAMPLE)
+        if out is not self._out:
+            if self._target is not None:
+                self._target.release()
+            self._target = memoryview(out.reshape(1).view(np.uint8))
+            self._out = out
+        target = self._target
+        sequence = self._sequence
+        block_bytes = self._block_bytes
+        for _ in range(SNAPSHOT_ATTEMPTS):
+            before = sequence[0]
+            if before & 1:
+                continue
+            target[:] = block_bytes
+            if sequence[0] == before:
+                return out
+        raise EE895Error("shared memory sample is not finished by the publisher")
@@ -22,6 +22,7 @@ We assume no liability for the information contained in this document.
 
 import time
 from ee895_i2c_library import EE895
+from ee895_i2c_scheduler import SamplingScheduler
 
 CSV_DELIMETER = ","
 
@@ -55,7 +56,9 @@ except Warning as exception:
 print("temperarture",CSV_DELIMETER,"CO2",CSV_DELIMETER,"pressure")
 time.sleep(1)
 
-for i in range(30):
+
+def print_measurements():
+    """read and print the measurements"""
     try:
         temperature, co2, pressure = EE_895.get_all_measurements()
         print('%0.2f °C' % temperature, CSV_DELIMETER, end="")
@@ -64,5 +67,8 @@ for i in range(30):
     except Warning as exception:
         print("Exception: " + str(exception))
 
-    finally:
-        time.sleep(15)
+
+# every 15 s on the wall clock, the bus time does not add up to a drift
+SCHEDULER = SamplingScheduler()
+SCHEDULER.add(print_measurements, 15, align=True)
+SCHEDULER.run(runs=30)
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Software EE895 for using the library without a Raspberry Pi and a sensor.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+"""
+
+import errno
+import random
+import struct
+import threading
+import time
+
+from ee895_i2c_library import (
+    Transport, crc16, crc16_start, DEFAULT_I2C_ADDRESS, SIMPLIFIED_I2C_ADDRESS,
+    FUNCTION_CODE_READ_REGISTER, FUNCTION_CODE_WRITE_REGISTER,
+    READ_ALL_MEASUREMENTS, MAX_REGISTERS_PER_READ, MEASUREMENT_REGISTERS,
+    USER_REGISTER_1, USER_REGISTER_2, REGISTER_TEMPERATURE_CELSIUS,
+    REGISTER_TEMPERATURE_FAHRENHEIT, REGISTER_TEMPERATURE_KELVIN,
+    REGISTER_CO2_AVERAGE_PC, REGISTER_CO2_RAW_PC, REGISTER_CO2_AVERAGE_NPC,
+    REGISTER_CO2_RAW_NPC, REGISTER_PRESSURE_MBAR, REGISTER_PRESSURE_PSI,
+    REGISTER_SERIAL_NUMBER, REGISTER_FIRMWARE_VERSION, REGISTER_SENSORNAME,
+    REGISTER_MEASURING_MODE, REGISTER_MEASURING_STATUS,
+    REGISTER_MEASURING_TRIGGER, REGISTER_DETAILED_STATUS,
+    REGISTER_CO2_MEASURING_INTERVAL, REGISTER_CO2_FILTER_COEFFICIENT,
+    REGISTER_CO2_CUSTOMER_OFFSET, CO2_RANGE, TEMPERATURE_RANGE, PRESSURE_RANGE)
+
+EXCEPTION_ILLEGAL_FUNCTION = 0x01
+EXCEPTION_ILLEGAL_ADDRESS = 0x02
+EXCEPTION_ILLEGAL_VALUE = 0x03
+WRITABLE_REGISTERS = {
+    REGISTER_MEASURING_MODE: range(0, 2),
+    REGISTER_MEASURING_TRIGGER: range(1, 2),
+    REGISTER_CO2_MEASURING_INTERVAL: range(100, 36001),
+    REGISTER_CO2_FILTER_COEFFICIENT: range(1, 21),
+    REGISTER_CO2_CUSTOMER_OFFSET: range(0, 0x10000),
+    USER_REGISTER_1: range(0, 0x10000),
+    USER_REGISTER_2: range(0, 0x10000),
+}
+
+
+class EE895Simulator(Transport):
+    """Answers Modbus over i2c and the simplified protocol like an EE895.
+
+    latency is slept on every transaction, nack_rate and crc_error_rate
+    inject random faults, clock and sleep can be replaced by a virtual clock.
+    """
+
+    def __init__(self, i2c_address=DEFAULT_I2C_ADDRESS, latency=0.0,
+                 conversion_time=1.0, clock=time.monotonic, sleep=time.sleep,
+                 seed=None):
+        self.i2c_address = i2c_address
+        self.latency = latency
+        self.conversion_time = conversion_time
+        self.clock = clock
+        self.sleep = sleep
+        self.nack_rate = 0.0
+        self.crc_error_rate = 0.0
+        self.transactions = 0
+        self.measurements = 0
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._pending_nacks = 0
+        self._pending_crc_errors = 0
+        self._data_ready = False
+        self._conversion_done = None
+        self.registers = {}
+        self._write_text(REGISTER_SERIAL_NUMBER, b"\x89\x50\x00\x00\x12\x34\x56\x78"
+                         b"\x00\x00\x00\x00\x00\x00\x00\x00")
+        self.registers[REGISTER_FIRMWARE_VERSION] = 0x0101
+        self._write_text(REGISTER_SENSORNAME, b"EE895".ljust(16, b"\x00"))
+        self.registers[REGISTER_MEASURING_MODE] = 0
+        self.registers[REGISTER_MEASURING_STATUS] = 0
+        self.registers[REGISTER_MEASURING_TRIGGER] = 0
+        self.registers[REGISTER_DETAILED_STATUS] = 0
+        self.registers[REGISTER_CO2_MEASURING_INTERVAL] = 150
+        self.registers[REGISTER_CO2_FILTER_COEFFICIENT] = 4
+        self.registers[REGISTER_CO2_CUSTOMER_OFFSET] = 0
+        self.registers[USER_REGISTER_1] = 0
+        self.registers[USER_REGISTER_2] = 0
+        self.temperature = 23.41
+        self.co2 = 500.0
+        self.pressure = 978.1
+        self._measure()
+        self._data_ready = False
+        self._next_measurement = self.clock() + self.measuring_interval()
+
+    def set_environment(self, temperature=None, co2=None, pressure=None):
+        """set the values the next measurement of the sensor will see"""
+        with self._lock:
+            if temperature is not None:
+                self.temperature = temperature
+            if co2 is not None:
+                self.co2 = co2
+            if pressure is not None:
+                self.pressure = pressure
+
+    def inject_faults(self, nacks=0, crc_errors=0):
+        """let the next transactions fail with a NACK or a corrupted crc"""
+        with self._lock:
+            self._pending_nacks += nacks
+            self._pending_crc_errors += crc_errors
+
+    def measuring_interval(self):
+        """measuring interval of the continuous mode in seconds"""
+        return self.registers[REGISTER_CO2_MEASURING_INTERVAL] / 10
+
+    def read_float(self, register_address):
+        """float stored in the registers"""
+        return struct.unpack(">f", struct.pack(
+            ">HH", self.registers[register_address + 1],
+            self.registers[register_address]))[0]
+
+    def write_read(self, i2c_address, buf, receiving_bytes):
+        """write buf to the i2c address and read receiving_bytes back"""
+        with self._lock:
+            self.transactions += 1
+            if self.latency:
+                self.sleep(self.latency)
+            if self._fault("_pending_nacks", self.nack_rate):
+                raise OSError(errno.EREMOTEIO, "Remote I/O error")
+            self._update()
+            buf = bytes(buf)
+            if i2c_address == SIMPLIFIED_I2C_ADDRESS and buf == bytes([READ_ALL_MEASUREMENTS]):
+                response = self._simplified_frame()
+            elif i2c_address == self.i2c_address:
+                response = self._modbus(buf)
+            else:
+                raise OSError(errno.EREMOTEIO, "Remote I/O error")
+            # reading past the end of the answer returns an idle bus
+            response = (response + [0xFF] * receiving_bytes)[:receiving_bytes]
+            if receiving_bytes and self._fault("_pending_crc_errors", self.crc_error_rate):
+                response[-1] ^= 0xFF
+            return response
+
+    def _fault(self, pending, rate):
+        """true if this transaction has to fail"""
+        if getattr(self, pending) > 0:
+            setattr(self, pending, getattr(self, pending) - 1)
+            return True
+        return rate > 0 and self._random.random() < rate
+
+    def _update(self):
+        """run the measurements that finished since the last transaction"""
+        now = self.clock()
+        if self.registers[REGISTER_MEASURING_MODE] == 0:
+            if now >= self._next_measurement:
+                self._measure()
+                interval = self.measuring_interval()
+                missed = int((now - self._next_measurement) // interval)
+                self._next_measurement += (missed + 1) * interval
+        elif self._conversion_done is not None and now >= self._conversion_done:
+            self._conversion_done = None
+            self._measure()
+
+    def _measure(self):
+        """store a new measurement in the registers and set data ready"""
+        co2 = self.co2 + struct.unpack(
+            ">h", struct.pack(">H", self.registers[REGISTER_CO2_CUSTOMER_OFFSET]))[0]
+        for register in (REGISTER_CO2_AVERAGE_PC, REGISTER_CO2_RAW_PC,
+                         REGISTER_CO2_AVERAGE_NPC, REGISTER_CO2_RAW_NPC):
+            self._write_float(register, co2)
+        self._write_float(REGISTER_TEMPERATURE_CELSIUS, self.temperature)
+        self._write_float(REGISTER_TEMPERATURE_FAHRENHEIT, self.temperature * 9 / 5 + 32)
+        self._write_float(REGISTER_TEMPERATURE_KELVIN, self.temperature + 273.15)
+        self._write_float(REGISTER_PRESSURE_MBAR, self.pressure)
+        self._write_float(REGISTER_PRESSURE_PSI, self.pressure * 0.0145037738)
+        status = 0
+        for bit, value, (low, high) in ((0, co2, CO2_RANGE),
+                                        (2, self.temperature, TEMPERATURE_RANGE),
+                                        (6, self.pressure, PRESSURE_RANGE)):
+            if value > high:
+                status |= 1 << bit
+            elif value < low:
+                status |= 1 << (bit + 1)
+        self.registers[REGISTER_DETAILED_STATUS] = status
+        self.measurements += 1
+        self._data_ready = True
+
+    def _write_float(self, register_address, value):
+        """store a float, the low word comes first like on the sensor"""
+        high, low = struct.unpack(">HH", struct.pack(">f", value))
+        self.registers[register_address] = low
+        self.registers[register_address + 1] = high
+
+    def _write_text(self, register_address, text):
+        """store bytes in consecutive registers"""
+        for i in range(0, len(text), 2):
+            self.registers[register_address + i // 2] = (text[i] << 8) + text[i + 1]
+
+    def _measuring_status(self):
+        """bit 0 => data ready, bit 1 => trigger ready"""
+        trigger_ready = (self.registers[REGISTER_MEASURING_MODE] == 1
+                         and self._conversion_done is None)
+        return int(self._data_ready) | (int(trigger_ready) << 1)
+
+    def _simplified_frame(self):
+        """8 byte frame at 0x5E: co2, temperature * 100, reserved, pressure * 10"""
+        self._data_ready = False
+        co2 = int(round(self.read_float(REGISTER_CO2_AVERAGE_PC))) & 0xFFFF
+        temperature = int(round(self.read_float(REGISTER_TEMPERATURE_CELSIUS) * 100)) & 0xFFFF
+        pressure = int(round(self.read_float(REGISTER_PRESSURE_MBAR) * 10)) & 0xFFFF
+        return [co2 >> 8, co2 & 0xFF, temperature >> 8, temperature & 0xFF,
+                0x00, 0x00, pressure >> 8, pressure & 0xFF]
+
+    def _modbus(self, frame):
+        """answer a Modbus request frame"""
+        if len(frame) < 7 or crc16(frame[:-2], crc16_start(self.i2c_address)) != \
+                frame[-2] + (frame[-1] << 8):
+            # the sensor does not answer requests with a broken crc
+            raise OSError(errno.EREMOTEIO, "Remote I/O error")
+        function_code = frame[0]
+        register_address = (frame[1] << 8) + frame[2]
+        value = (frame[3] << 8) + frame[4]
+        if function_code == FUNCTION_CODE_READ_REGISTER:
+            return self._read_registers(register_address, value)
+        if function_code == FUNCTION_CODE_WRITE_REGISTER:
+            return self._write_register(frame, register_address, value)
+        return self._exception(function_code, EXCEPTION_ILLEGAL_FUNCTION)
+
+    def _read_registers(self, register_address, count):
+        """answer a read request"""
+        addresses = range(register_address, register_address + count)
+        if not 0 < count <= MAX_REGISTERS_PER_READ:
+            return self._exception(FUNCTION_CODE_READ_REGISTER, EXCEPTION_ILLEGAL_VALUE)
+        if any(address not in self.registers for address in addresses):
+            return self._exception(FUNCTION_CODE_READ_REGISTER, EXCEPTION_ILLEGAL_ADDRESS)
+        response = [FUNCTION_CODE_READ_REGISTER, 2 * count]
+        for address in addresses:
+            if address == REGISTER_MEASURING_STATUS:
+                word = self._measuring_status()
+            else:
+                word = self.registers[address]
+            response += [word >> 8, word & 0xFF]
+        if any(address in MEASUREMENT_REGISTERS for address in addresses):
+            self._data_ready = False
+        return self._with_crc(response)
+
+    def _write_register(self, frame, register_address, value):
+        """answer a write request, the sensor echoes the request"""
+        if value not in WRITABLE_REGISTERS.get(register_address, ()):
+            return self._exception(FUNCTION_CODE_WRITE_REGISTER, EXCEPTION_ILLEGAL_VALUE)
+        if register_address == REGISTER_MEASURING_TRIGGER:
+            if self.registers[REGISTER_MEASURING_MODE] != 1 or self._conversion_done is not None:
+                return self._exception(FUNCTION_CODE_WRITE_REGISTER, EXCEPTION_ILLEGAL_VALUE)
+            self._conversion_done = self.clock() + self.conversion_time
+            self._data_ready = False
+        else:
+            self.registers[register_address] = value
+        if register_address in (REGISTER_MEASURING_MODE, REGISTER_CO2_MEASURING_INTERVAL):
+            self._conversion_done = None
+            self._next_measurement = self.clock() + self.measuring_interval()
+        return list(frame)
+
+    def _exception(self, function_code, exception_code):
+        """Modbus exception response"""
+        return self._with_crc([function_code | 0x80, exception_code])
+
+    def _with_crc(self, response):
+        """append the crc of the response"""
+        crc = crc16(response, crc16_start(self.i2c_address))
+        return response + [crc & 0xFF, crc >> 8]
@@ -22,6 +22,8 @@ We assume no liability for the information contained in this document.
 
 import time
 from ee895_i2c_library import EE895
+from ee895_i2c_scheduler import SamplingScheduler
+from ee895_i2c_single_shot_engine import SingleShotEngine
 
 CSV_DELIMETER = ","
 
@@ -51,17 +53,23 @@ except Warning as exception:
 print("temperarture",CSV_DELIMETER,"CO2",CSV_DELIMETER,"pressure")
 time.sleep(1)
 
-for i in range(30):
-    try:
-        EE_895.trigger_new_measurement()
-        temperature = EE_895.get_temp_c()
-        co2 = EE_895.get_co2_aver_with_pc()
-        pressure = EE_895.get_pressure_mbar()
-        print('%0.2f °C' % temperature, CSV_DELIMETER, end="")
-        print('%0.0f ppm' % co2, CSV_DELIMETER, end="")
-        print('%0.1f mbar' % pressure)
-    except Warning as exception:
-        print("Exception: " + str(exception))
+# the engine triggers, waits until the data is ready and reads all values
+ENGINE = SingleShotEngine()
+ENGINE.add(EE_895)
 
-    finally:
-        time.sleep(15)
+
+def print_shot():
+    """measure and print the measurements"""
+    shot = ENGINE.shoot()[0]
+    if shot.error is None:
+        print('%0.2f °C' % shot.readings["temperature_c"].value, CSV_DELIMETER, end="")
+        print('%0.0f ppm' % shot.readings["co2_average_pc"].value, CSV_DELIMETER, end="")
+        print('%0.1f mbar' % shot.readings["pressure_mbar"].value)
+    else:
+        print("Exception: " + str(shot.error))
+
+
+# every 15 s on the wall clock, the bus time does not add up to a drift
+SCHEDULER = SamplingScheduler()
+SCHEDULER.add(print_shot, 15, align=True)
+SCHEDULER.run(runs=30)
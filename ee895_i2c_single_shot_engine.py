@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Single shot measurements of one or many EE895 Sensors via I2c interface.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+"""
+
+import time
+from collections import namedtuple
+
+from ee895_i2c_library import CONVERSION_TIME_WEIGHT, SAMPLE_QUANTITIES
+
+# latency is the time from the trigger to the values being read, polls
+# counts the data_ready reads; error is None or the exception of the shot
+Shot = namedtuple("Shot", ["key", "readings", "latency", "polls", "error"])
+
+
+class _Pending():
+    """A triggered sensor waiting for its data."""
+
+    def __init__(self, key, sensor, triggered, due, poll_interval):
+        self.key = key
+        self.sensor = sensor
+        self.triggered = triggered
+        self.due = due
+        self.poll_interval = poll_interval
+        self.not_ready = None
+        self.polls = 0
+
+
+class SingleShotEngine():
+    """Triggers sensors in single shot mode and reads them once their data
+    is ready.
+
+    All sensors are triggered first, then collected as their conversions
+    finish, so the conversions run in parallel. The conversion time of
+    every sensor is learned: data_ready is first polled when the conversion
+    is expected to end, then every poll_interval, doubling up to
+    max_poll_interval. The values are read with read_many, in the
+    fewest transactions. A failing sensor ends up in its Shot and does not
+    stop the others.
+    """
+
+    def __init__(self, quantities=SAMPLE_QUANTITIES, poll_interval=0.005,
+                 max_poll_interval=0.5, timeout=10.0, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.quantities = quantities
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.timeout = timeout
+        self.clock = clock
+        self.sleep = sleep
+        self.sensors = {}
+        self.conversion_times = {}
+
+    def add(self, sensor, key=None):
+        """add a sensor in single shot mode and return its key"""
+        if key is None:
+            key = (getattr(sensor.bus, "bus_number", id(sensor.bus)), sensor.i2c_address)
+        if key in self.sensors:
+            raise ValueError("sensor %r is already added" % (key,))
+        self.sensors[key] = sensor
+        return key
+
+    def remove(self, key):
+        """remove the sensor with key"""
+        del self.sensors[key]
+        self.conversion_times.pop(key, None)
+
+    def shoot(self, keys=None):
+        """measure the sensors with keys, all without keys; returns a list
+        of Shot in the order the sensors finished"""
+        shots = []
+        pending = []
+        for key in self.sensors if keys is None else keys:
+            sensor = self.sensors[key]
+            try:
+                sensor.trigger_new_measurement()
+            except (OSError, Warning) as exception:
+                shots.append(Shot(key, None, None, 0, exception))
+                continue
+            triggered = self.clock()
+            conversion_time = self.conversion_times.get(key)
+            due = triggered + (self.poll_interval if conversion_time is None
+                               else conversion_time)
+            pending.append(_Pending(key, sensor, triggered, due, self.poll_interval))
+        while pending:
+            entry = min(pending, key=lambda entry: entry.due)
+            delay = entry.due - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+            shot = self._poll(entry)
+            if shot is not None:
+                pending.remove(entry)
+                shots.append(shot)
+        return shots
+
+    def _poll(self, entry):
+        """poll one sensor, returns its Shot when it is done"""
+        entry.polls += 1
+        try:
+            ready = entry.sensor.data_ready()
+            now = self.clock()
+            if not ready:
+                if now - entry.triggered >= self.timeout:
+                    raise TimeoutError("EE895 %r not ready after %.1f s"
+                                       % (entry.key, now - entry.triggered))
+                entry.not_ready = now
+                entry.due = now + entry.poll_interval
+                entry.poll_interval = min(entry.poll_interval * 2, self.max_poll_interval)
+                return None
+            self._learn(entry, now)
+            readings = entry.sensor.read_many(self.quantities)
+        except (OSError, Warning) as exception:
+            return Shot(entry.key, None, self.clock() - entry.triggered,
+                        entry.polls, exception)
+        return Shot(entry.key, readings, self.clock() - entry.triggered, entry.polls, None)
+
+    def _learn(self, entry, ready):
+        """update the conversion time of a sensor; it ended between the
+        last poll that was not ready and the one that was. If the first
+        poll was ready already, the next one comes a poll interval earlier
+        to find out by how much the conversion time is overestimated."""
+        conversion_time = self.conversion_times.get(entry.key)
+        if entry.not_ready is None:
+            waited = ready - entry.triggered
+            if conversion_time is not None:
+                waited = min(waited, conversion_time)
+            self.conversion_times[entry.key] = max(waited - self.poll_interval, 0.0)
+            return
+        waited = (entry.not_ready + ready) / 2 - entry.triggered
+        if conversion_time is None:
+            self.conversion_times[entry.key] = waited
+        else:
+            self.conversion_times[entry.key] = (
+                conversion_time + CONVERSION_TIME_WEIGHT * (waited - conversion_time))
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory ring buffer of EE895 samples with window statistics.
+
+Copyright 2023 E+E Elektronik Ges.m.b.H.
+
+Disclaimer:
+This application example is non-binding and does not claim to be complete with
+regard to configuration and equipment as well as all eventualities. The
+application example is intended to provide assistance with the EE895 sensor
+module design-in and is provided "as is".You yourself are responsible for the
+proper operation of the products described. This application example does not
+release you from the obligation to handle the product safely during
+application, installation, operation and maintenance. By using this application
+example, you acknowledge that we cannot be held liable for any damage beyond
+the liability regulations described.
+
+We reserve the right to make changes to this application example at any time
+without notice. In case of discrepancies between the suggestions in this
+application example and other E+E publications, such as catalogues, the content
+of the other documentation takes precedence. We assume no liability for
+the information contained in this document.
+"""
+
+import bisect
+import math
+
+import numpy as np
+
+# 21 bytes per sample, a month of 15 s samples takes 3.6 MB per sensor
+SERIES_SAMPLE = np.dtype([("timestamp", "<f8"), ("temperature", "<f4"),
+                          ("co2", "<f4"), ("pressure", "<f4"), ("status", "u1")])
+
+
+class TimeSeries():
+    """Fixed capacity ring buffer of samples in chronological order.
+
+    append() overwrites the oldest sample once the buffer is full. The
+    timestamps must not decrease, e.g. the monotonic ones of EE895.stream.
+    start and end of the queries are timestamps, None means unbounded;
+    since(seconds) gives the start of a trailing window.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, SERIES_SAMPLE)
+        self._next = 0
+        self._count = 0
+
+    @classmethod
+    def for_duration(cls, duration, interval):
+        """buffer holding duration seconds of samples taken every interval"""
+        return cls(int(math.ceil(duration / interval)))
+
+    @property
+    def nbytes(self):
+        """memory taken by the samples"""
+        return self.data.nbytes
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp, temperature, co2, pressure, status=0):
+        """add a sample in O(1), no memory is allocated"""
+        index = self._next
+        self.data[index] = (timestamp, temperature, co2, pressure, status)
+        index += 1
+        self._next = 0 if index == self.capacity else index
+        if self._count < self.capacity:
+            self._count += 1
+
+    def append_sample(self, sample, status=0):
+        """add a Sample of EE895.stream"""
+        self.append(sample.timestamp, sample.temperature, sample.co2,
+                    sample.pressure, status)
+
+    def clear(self):
+        """forget all samples"""
+        self._next = 0
+        self._count = 0
+
+    def latest(self):
+        """the newest sample, None when empty"""
+        if not self._count:
+            return None
+        return self.data[self._next - 1]
+
+    def since(self, seconds):
+        """start timestamp of the window of the last seconds"""
+        latest = self.latest()
+        return -math.inf if latest is None else latest["timestamp"] - seconds
+
+    def chunks(self, start=None, end=None):
+        """samples with start <= timestamp < end as a list of one or, when
+        the window wraps around the end of the buffer, two views"""
+        if self._count < self.capacity:
+            parts = [self.data[:self._count]]
+        elif self._next == 0:
+            parts = [self.data]
+        else:
+            parts = [self.data[self._next:], self.data[:self._next]]
+        chunks = []
+        for part in parts:
+            timestamps = part["timestamp"]
+            # bisect instead of np.searchsorted, which copies strided arrays
+            low = 0 if start is None else bisect.bisect_left(timestamps, start)
+            high = len(part) if end is None else bisect.bisect_left(timestamps, end)
+            if low < high:
+                chunks.append(part[low:high])
+        return chunks
+
+    def window(self, start=None, end=None):
+        """samples with start <= timestamp < end as one array, a view when
+        they are contiguous in the buffer, else a copy"""
+        chunks = self.chunks(start, end)
+        if not chunks:
+            return self.data[:0]
+        if len(chunks) == 1:
+            return chunks[0]
+        return np.concatenate(chunks)
+
+    def mean(self, field, start=None, end=None):
+        """mean of field in the window, nan when it is empty"""
+        chunks = self.chunks(start, end)
+        count = sum(len(chunk) for chunk in chunks)
+        if not count:
+            return math.nan
+        return float(sum(chunk[field].sum(dtype=np.float64) for chunk in chunks) / count)
+
+    def minimum(self, field, start=None, end=None):
+        """smallest value of field in the window, nan when it is empty"""
+        chunks = self.chunks(start, end)
+        return min((float(chunk[field].min()) for chunk in chunks), default=math.nan)
+
+    def maximum(self, field, start=None, end=None):
+        """largest value of field in the window, nan when it is empty"""
+        chunks = self.chunks(start, end)
+        return max((float(chunk[field].max()) for chunk in chunks), default=math.nan)
+
+    def percentile(self, field, q, start=None, end=None):
+        """percentile q (a number or a sequence, 0..100) of field in the window"""
+        values = self.window(start, end)[field]
+        if not len(values):
+            return np.full(np.shape(q), math.nan)[()]
+        return np.percentile(values, q)
+
+    def rate_of_change(self, field, start=None, end=None):
+        """least squares slope of field in the window in units per second,
+        nan with less than two samples"""
+        window = self.window(start, end)
+        if len(window) < 2:
+            return math.nan
+        timestamps = window["timestamp"] - window["timestamp"][0]
+        values = window[field].astype(np.float64)
+        timestamps -= timestamps.mean()
+        spread = np.dot(timestamps, timestamps)
+        if not spread:
+            return math.nan
+        return float(np.dot(timestamps, values - values.mean()) / spread)
+
+    def rolling(self, field, samples, function=np.mean, start=None, end=None):
+        """function (np.mean, np.min, np.max, ... taking axis) over every run
+        of samples consecutive values of field in the window"""
+        values = self.window(start, end)[field]
+        if len(values) < samples:
+            return values[:0]
+        if function is np.mean:
+            sums = np.cumsum(values, dtype=np.float64)
+            sums[samples:] = sums[samples:] - sums[:-samples]
+            return sums[samples - 1:] / samples
+        return function(np.lib.stride_tricks.sliding_window_view(values, samples), axis=1)